@@ -1,105 +1,416 @@
 import requests
-import json
 import logging
+import re
+from availability import check_availability_many, BulkAvailabilityUnsupported, BULK_UNSUPPORTED_STATUS_CODES
+from backend_profiles import (MOVIES, TICKETING, EMAIL, PROFILES, DEFAULT_PROFILE, profile_from_config,
+                              credentials_from_config)
+from cache import ResponseCache
+from concurrency import batched, fetch_many, DEFAULT_MAX_WORKERS
+from http_transport import get_default_transport
+from instrumentation import span, traced
+from multi_search import iter_searches, search_targets, DEFAULT_MAX_SEARCHES
+from records import (Schedule, InvalidRecord, decode_json, decode_schedules, decode_movie_details, parse_movie_ids,
+                     parse_schedules)
+from schedule_sync import ScheduleSyncStore, merge_schedule_changes, response_bytes, DELTA_UNSUPPORTED_STATUS_CODES
+from search_index import MovieSearchIndex, DEFAULT_SEARCH_LIMIT
+from single_flight import SingleFlight
+
+SCHEDULE_BATCH_SIZE = 100
+STREAM_ACCEPT = "application/x-ndjson, application/json;q=0.9"
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+# Input checks shared by both windows, before anything is sent upstream.
+def validate_date(date):
+    return DATE_PATTERN.match(date or "")
+
+
+def validate_seats(seats):
+    try:
+        seats = int(seats)
+        return seats > 0
+    except (TypeError, ValueError):
+        return False
 
 
 class APIClient:
-    def __init__(self, api_key):
+    # The one client core behind both windows, the batch booker and the
+    # benchmarks: pooling, rate limits, caching, coalescing, sync and tracing
+    # all live here. Which hosts it talks to and how it authenticates comes
+    # from a backend profile.
+    def __init__(self, api_key, transport=None, cache=None, combined_booking=None, delta_sync=True,
+                 profile=None, auth_token=None, email_auth_token=None):
         self.api_key = api_key
-        self.base_url = "https://api.example.com"
+        self.profile = profile or PROFILES[DEFAULT_PROFILE]
+        self.credentials = {
+            MOVIES: api_key,
+            TICKETING: auth_token,
+            EMAIL: email_auth_token
+        }
+        # Set when the bookings endpoint can check availability itself
+        self.combined_booking = self.profile.combined_booking if combined_booking is None else combined_booking
+        self.bulk_availability = True
+        # Cleared once the upstream turns out to have no changes endpoint
+        self.delta_sync = delta_sync
+        self.transport = transport or get_default_transport()
+        self.cache = cache or ResponseCache()
+        # Identical lookups already in flight share one upstream request
+        self.flights = SingleFlight()
+        # Refetched schedules are revalidated or delta-synced instead of re-downloaded
+        self.schedule_sync = ScheduleSyncStore()
+        # Titles and synopses of every movie whose details were loaded
+        self.search_index = MovieSearchIndex()
 
+    validate_date = staticmethod(validate_date)
+    validate_seats = staticmethod(validate_seats)
+
+    @classmethod
+    def from_config(cls, config, default_profile=DEFAULT_PROFILE, **kwargs):
+        # Credentials, profile and host overrides as stored in the encrypted config
+        credentials = credentials_from_config(config)
+        return cls(credentials[MOVIES], profile=profile_from_config(config, default_profile),
+                   auth_token=credentials[TICKETING], email_auth_token=credentials[EMAIL], **kwargs)
+
+    def _auth_params(self, service):
+        return self.profile.auth_params(service, self.credentials)
+
+    def _auth_headers(self, service):
+        return self.profile.auth_headers(service, self.credentials)
+
+    @traced()
     def get_movie_schedules(self, location, date):
+        return self.cache.get_or_load("schedules", (location, date),
+                                      lambda: self._load_movie_schedules(location, date))
+
+    def _load_movie_schedules(self, location, date):
+        return self.flights.do(("schedules", location, date),
+                               lambda: self._fetch_movie_schedules(location, date))
+
+    def _fetch_movie_schedules(self, location, date):
+        state = self.schedule_sync.get((location, date))
+        if state is not None and state.cursor is not None and self.delta_sync:
+            schedules = self._sync_schedule_changes(location, date, state)
+            if schedules is not None:
+                return schedules
+
         endpoint = "/schedules"
-        url = f"{self.base_url}{endpoint}"
+        url = self.profile.url(MOVIES, endpoint)
         params = {
             "location": location,
             "date": date,
-            "api_key": self.api_key
+            **self._auth_params(MOVIES)
         }
+        headers = self._auth_headers(MOVIES)
+        headers.update(self.schedule_sync.conditional_headers((location, date)))
 
         try:
-            response = requests.get(url, params=params)
+            response = self.transport.get(url, service=MOVIES, params=params, headers=headers)
             response.raise_for_status()  # Raise exception for non-2xx status codes
-            schedules = response.json()
+            if response.status_code == 304 and state is not None:
+                self.schedule_sync.record("not_modified", response_bytes(response))
+                return state.schedules
+            with span("json.decode", endpoint="schedules"):
+                schedules = decode_schedules(response.content)
+            self.schedule_sync.record("full", response_bytes(response))
+            self.schedule_sync.remember((location, date), response, schedules)
             return schedules
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             logging.error(f"Error occurred while retrieving schedules: {e}")
             return None
 
+    def _sync_schedule_changes(self, location, date, state):
+        # Fetches only the schedules changed since the last sync and merges
+        # them into the held list. None means a full fetch is needed instead.
+        endpoint = "/schedules/changes"
+        url = self.profile.url(MOVIES, endpoint)
+        params = {
+            "location": location,
+            "date": date,
+            "since": state.cursor,
+            **self._auth_params(MOVIES)
+        }
+
+        try:
+            response = self.transport.get(url, service=MOVIES, params=params, headers=self._auth_headers(MOVIES))
+            if response.status_code in DELTA_UNSUPPORTED_STATUS_CODES:
+                self.delta_sync = False
+                return None
+            response.raise_for_status()  # Raise exception for non-2xx status codes
+            changes = decode_json(response.content)
+            if not isinstance(changes, dict):
+                raise InvalidRecord(f"schedule changes are not an object: {type(changes).__name__}")
+            changed = parse_schedules(changes.get("changed", []))
+            removed = parse_movie_ids(changes.get("removed", []))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Error occurred while syncing schedule changes: {e}")
+            return None
+
+        if changes.get("reset"):
+            # The upstream no longer has history back to our cursor
+            return None
+        schedules = merge_schedule_changes(state.schedules, changed, removed)
+        self.schedule_sync.record("delta", response_bytes(response))
+        self.schedule_sync.advance((location, date), changes.get("cursor"), schedules)
+        return schedules
+
+    @traced()
+    def iter_movie_schedules(self, location, date):
+        cached = self.cache.lookup("schedules", (location, date),
+                                   lambda: self._load_movie_schedules(location, date))
+        if cached is not None:
+            yield from cached
+            return
+
+        flight = ("schedules", location, date)
+        leader, shared = self.flights.acquire(flight)
+        if not leader:
+            # An identical search is already streaming; reuse what it fetched
+            yield from shared or ()
+            return
+
+        schedules = None
+        try:
+            schedules = yield from self._stream_movie_schedules(location, date)
+        finally:
+            self.flights.release(flight, schedules)
+        if schedules is not None:
+            self.cache.set(flight, schedules)
+
+    def _stream_movie_schedules(self, location, date):
+        endpoint = "/schedules"
+        url = self.profile.url(MOVIES, endpoint)
+        params = {
+            "location": location,
+            "date": date,
+            **self._auth_params(MOVIES)
+        }
+        headers = {
+            "Accept": STREAM_ACCEPT,
+            **self._auth_headers(MOVIES)
+        }
+        headers.update(self.schedule_sync.conditional_headers((location, date)))
+
+        schedules = []
+        try:
+            with self.transport.get(url, service=MOVIES, params=params, headers=headers, stream=True) as response:
+                response.raise_for_status()  # Raise exception for non-2xx status codes
+                state = self.schedule_sync.get((location, date))
+                if response.status_code == 304 and state is not None:
+                    self.schedule_sync.record("not_modified", 0)
+                    schedules = state.schedules
+                    yield from schedules
+                else:
+                    # JSON Lines is parsed row by row; a plain JSON array has to be read whole
+                    if "ndjson" in response.headers.get("Content-Type", ""):
+                        rows = (Schedule.from_dict(decode_json(line)) for line in response.iter_lines() if line)
+                    else:
+                        rows = decode_schedules(response.content)
+                    for schedule in rows:
+                        schedules.append(schedule)
+                        yield schedule
+                    size = response.headers.get("Content-Length")
+                    self.schedule_sync.record("full", int(size) if size is not None else 0)
+                    self.schedule_sync.remember((location, date), response, schedules)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Error occurred while streaming schedules: {e}")
+            return None
+        return schedules
+
+    def iter_schedule_batches(self, location, date, batch_size=SCHEDULE_BATCH_SIZE):
+        for schedules in batched(self.iter_movie_schedules(location, date), batch_size):
+            movie_ids = [schedule.movie_id for schedule in schedules]
+            yield schedules, self.get_movie_details_many(movie_ids)
+
+    def search_schedules_many(self, locations, dates, max_searches=DEFAULT_MAX_SEARCHES):
+        # Yields (location, date, schedules, movie_details_list) per search as it completes
+        return iter_searches(self, search_targets(locations, dates), max_searches)
+
+    @traced()
     def get_movie_details(self, movie_id):
+        movie_details = self.cache.get_or_load("movie_details", (movie_id,),
+                                               lambda: self.flights.do(("movie_details", movie_id),
+                                                                       lambda: self._fetch_movie_details(movie_id)))
+        if movie_details:
+            self.search_index.add(movie_details)
+        return movie_details
+
+    def _fetch_movie_details(self, movie_id):
         endpoint = f"/movies/{movie_id}"
-        url = f"{self.base_url}{endpoint}"
+        url = self.profile.url(MOVIES, endpoint)
         params = {
-            "api_key": self.api_key
+            **self._auth_params(MOVIES)
         }
 
         try:
-            response = requests.get(url, params=params)
+            response = self.transport.get(url, service=MOVIES, params=params, headers=self._auth_headers(MOVIES))
             response.raise_for_status()  # Raise exception for non-2xx status codes
-            movie_details = response.json()
+            with span("json.decode", endpoint="movie_details"):
+                movie_details = decode_movie_details(response.content, movie_id)
             return movie_details
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             logging.error(f"Error occurred while retrieving movie details: {e}")
             return None
 
+    def search_movies(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        return self.search_index.search(query, limit)
+
+    def index_cached_details(self):
+        # Makes the movies persisted by earlier sessions searchable right away
+        if self.cache.backing is None:
+            return 0
+        movie_details_list = list(self.cache.backing.iter_values("movie_details"))
+        self.search_index.add_many(movie_details_list)
+        return len(movie_details_list)
+
+    @traced()
+    def get_movie_details_many(self, movie_ids, max_workers=DEFAULT_MAX_WORKERS):
+        return fetch_many(self.get_movie_details, movie_ids, max_workers)
+
+    @traced()
     def check_seat_availability(self, movie_id, showtime, seats):
+        try:
+            return self._post_availability(movie_id, showtime, seats)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error occurred while checking seat availability: {e}")
+            return False
+
+    def _post_availability(self, movie_id, showtime, seats):
         endpoint = "/seats/check_availability"
-        url = f"{self.base_url}{endpoint}"
+        url = self.profile.url(TICKETING, endpoint)
+        payload = {
+            "movie_id": movie_id,
+            "showtime": showtime,
+            "seats": seats
+        }
+        headers = {
+            "Content-Type": "application/json",
+            **self._auth_headers(TICKETING)
+        }
+
+        response = self.transport.post(url, service=TICKETING, json=payload, headers=headers)
+        response.raise_for_status()  # Raise exception for non-2xx status codes
+        return response.json().get("availability")
+
+    @traced()
+    def check_seat_availability_many(self, queries, max_workers=DEFAULT_MAX_WORKERS, max_fanout=None):
+        # Checks that fail raise instead of answering False, so throttling or
+        # an outage leaves showtimes unknown rather than sold out
+        post_bulk = self._post_bulk_availability if self.bulk_availability else None
+        return check_availability_many(queries, self._post_availability, post_bulk,
+                                       max_workers=max_workers, max_fanout=max_fanout)
+
+    def _post_bulk_availability(self, queries):
+        endpoint = "/seats/check_availability/bulk"
+        url = self.profile.url(TICKETING, endpoint)
+        payload = {
+            "queries": [{"movie_id": movie_id, "showtime": showtime, "seats": seats}
+                        for movie_id, showtime, seats in queries]
+        }
+        headers = {
+            "Content-Type": "application/json",
+            **self._auth_headers(TICKETING)
+        }
+
+        response = self.transport.post(url, service=TICKETING, json=payload, headers=headers)
+        if response.status_code in BULK_UNSUPPORTED_STATUS_CODES:
+            # Remembered so later calls go straight to the per-query fallback
+            self.bulk_availability = False
+            raise BulkAvailabilityUnsupported(url)
+        response.raise_for_status()  # Raise exception for non-2xx status codes
+        return response.json().get("availability", [])
+
+    @traced()
+    def make_ticket_booking(self, movie_id, showtime, seats, idempotency_key=None):
+        endpoint = "/bookings"
+        url = self.profile.url(TICKETING, endpoint)
         payload = {
             "movie_id": movie_id,
             "showtime": showtime,
             "seats": seats
         }
+        if self.profile.customer_id:
+            payload["customer_id"] = self.profile.customer_id
         headers = {
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            **self._auth_headers(TICKETING)
         }
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.transport.post(url, service=TICKETING, json=payload, headers=headers)
             response.raise_for_status()  # Raise exception for non-2xx status codes
-            availability = response.json().get("availability")
-            return availability
+            booking_status = response.json().get("status")
+            return booking_status == "success"
         except requests.exceptions.RequestException as e:
-            logging.error(f"Error occurred while checking seat availability: {e}")
+            logging.error(f"Error occurred while making ticket booking: {e}")
             return False
 
-    def make_ticket_booking(self, movie_id, showtime, seats):
+    @traced()
+    def check_and_book(self, movie_id, showtime, seats, idempotency_key=None):
         endpoint = "/bookings"
-        url = f"{self.base_url}{endpoint}"
+        url = self.profile.url(TICKETING, endpoint)
         payload = {
             "movie_id": movie_id,
             "showtime": showtime,
-            "seats": seats
+            "seats": seats,
+            "check_availability": True
         }
+        if self.profile.customer_id:
+            payload["customer_id"] = self.profile.customer_id
         headers = {
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            **self._auth_headers(TICKETING)
         }
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.transport.post(url, service=TICKETING, json=payload, headers=headers)
             response.raise_for_status()  # Raise exception for non-2xx status codes
             booking_status = response.json().get("status")
-            return booking_status == "success"
+            if booking_status == "success":
+                return "booked"
+            return "unavailable" if booking_status == "unavailable" else "failed"
         except requests.exceptions.RequestException as e:
             logging.error(f"Error occurred while making ticket booking: {e}")
-            return False
+            return "failed"
 
-    def send_booking_confirmation_email(self, movie_id, showtime, seats):
+    @traced()
+    def send_booking_confirmation_email(self, movie_id, showtime, seats, idempotency_key=None):
         endpoint = "/send"
-        url = f"{self.base_url}{endpoint}"
+        url = self.profile.url(EMAIL, endpoint)
         payload = {
             "to": "customer@example.com",
             "subject": "Booking Confirmation",
             "body": f"Thank you for booking tickets!\n\nMovie ID: {movie_id}\nShowtime: {showtime}\nSeats: {seats}"
         }
         headers = {
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            **self._auth_headers(EMAIL)
         }
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.transport.post(url, service=EMAIL, json=payload, headers=headers)
             response.raise_for_status()  # Raise exception for non-2xx status codes
             return True
         except requests.exceptions.RequestException as e:
             logging.error(f"Error occurred while sending booking confirmation email: {e}")
             return False
+
+    def connection_stats(self):
+        return self.transport.connection_stats()
+
+    def upstream_stats(self):
+        return self.transport.upstream_stats()
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+    def coalescing_stats(self):
+        return self.flights.stats()
+
+    def sync_stats(self):
+        return self.schedule_sync.stats()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+
+import aiohttp
+from backend_profiles import BackendProfile, MOVIES, TICKETING, EMAIL, PROFILES, DEFAULT_PROFILE
+from records import MovieDetails, decode_json, parse_schedules
+
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_CONNECTION_LIMIT_PER_HOST = 10
+DEFAULT_KEEPALIVE_TIMEOUT = 30
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=3.05, sock_read=10)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.3
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+NETWORK_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class AsyncAPIClient:
+    def __init__(self, api_key, base_url=None, limit=DEFAULT_CONNECTION_LIMIT,
+                 limit_per_host=DEFAULT_CONNECTION_LIMIT_PER_HOST, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 profile=None, auth_token=None, email_auth_token=None):
+        self.api_key = api_key
+        # Hosts and auth come from the same backend profiles as APIClient; a
+        # base_url puts every service behind that one host
+        if profile is None:
+            profile = BackendProfile.single_host(base_url) if base_url else PROFILES[DEFAULT_PROFILE]
+        self.profile = profile
+        self.credentials = {
+            MOVIES: api_key,
+            TICKETING: auth_token,
+            EMAIL: email_auth_token
+        }
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def session(self):
+        # Created lazily so it binds to the loop the client is first used on.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _auth_params(self, service):
+        return self.profile.auth_params(service, self.credentials)
+
+    def _auth_headers(self, service):
+        return self.profile.auth_headers(service, self.credentials)
+
+    async def _get_json(self, url, params):
+        # GETs are idempotent, so transient failures are retried with backoff.
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.session.get(url, params=params, headers=self._auth_headers(MOVIES)) as response:
+                    if response.status in RETRY_STATUS_CODES and attempt < self.retries:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=response.status
+                        )
+                    response.raise_for_status()  # Raise exception for non-2xx status codes
+                    return await response.json(content_type=None, loads=decode_json)
+            except NETWORK_ERRORS as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUS_CODES
+                if not retryable or attempt >= self.retries:
+                    raise
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def _post_json(self, url, payload, service=TICKETING):
+        async with self.session.post(url, json=payload, headers=self._auth_headers(service)) as response:
+            response.raise_for_status()  # Raise exception for non-2xx status codes
+            body = await response.json(content_type=None, loads=decode_json)
+        if not isinstance(body, dict):
+            raise ValueError(f"response is not an object: {type(body).__name__}")
+        return body
+
+    async def get_movie_schedules(self, location, date):
+        endpoint = "/schedules"
+        url = self.profile.url(MOVIES, endpoint)
+        params = {
+            "location": location,
+            "date": date,
+            **self._auth_params(MOVIES)
+        }
+
+        try:
+            return parse_schedules(await self._get_json(url, params))
+        except NETWORK_ERRORS + (ValueError,) as e:
+            logging.error(f"Error occurred while retrieving schedules: {e}")
+            return None
+
+    async def get_movie_details(self, movie_id):
+        endpoint = f"/movies/{movie_id}"
+        url = self.profile.url(MOVIES, endpoint)
+        params = {
+            **self._auth_params(MOVIES)
+        }
+
+        try:
+            return MovieDetails.from_dict(await self._get_json(url, params), movie_id)
+        except NETWORK_ERRORS + (ValueError,) as e:
+            logging.error(f"Error occurred while retrieving movie details: {e}")
+            return None
+
+    async def get_movie_details_many(self, movie_ids):
+        movie_ids = list(movie_ids)
+        unique_ids = list(dict.fromkeys(movie_ids))
+        results = await asyncio.gather(*(self.get_movie_details(movie_id) for movie_id in unique_ids))
+        details_by_id = dict(zip(unique_ids, results))
+        return [details_by_id[movie_id] for movie_id in movie_ids]
+
+    async def check_seat_availability(self, movie_id, showtime, seats):
+        endpoint = "/seats/check_availability"
+        url = self.profile.url(TICKETING, endpoint)
+        payload = {
+            "movie_id": movie_id,
+            "showtime": showtime,
+            "seats": seats
+        }
+
+        try:
+            response = await self._post_json(url, payload)
+            return response.get("availability")
+        except NETWORK_ERRORS + (ValueError,) as e:
+            logging.error(f"Error occurred while checking seat availability: {e}")
+            return False
+
+    async def make_ticket_booking(self, movie_id, showtime, seats):
+        endpoint = "/bookings"
+        url = self.profile.url(TICKETING, endpoint)
+        payload = {
+            "movie_id": movie_id,
+            "showtime": showtime,
+            "seats": seats
+        }
+        if self.profile.customer_id:
+            payload["customer_id"] = self.profile.customer_id
+
+        try:
+            response = await self._post_json(url, payload)
+            return response.get("status") == "success"
+        except NETWORK_ERRORS + (ValueError,) as e:
+            logging.error(f"Error occurred while making ticket booking: {e}")
+            return False
+
+    async def send_booking_confirmation_email(self, movie_id, showtime, seats):
+        endpoint = "/send"
+        url = self.profile.url(EMAIL, endpoint)
+        payload = {
+            "to": "customer@example.com",
+            "subject": "Booking Confirmation",
+            "body": f"Thank you for booking tickets!\n\nMovie ID: {movie_id}\nShowtime: {showtime}\nSeats: {seats}"
+        }
+
+        try:
+            async with self.session.post(url, json=payload, headers=self._auth_headers(EMAIL)) as response:
+                response.raise_for_status()  # Raise exception for non-2xx status codes
+            return True
+        except NETWORK_ERRORS + (ValueError,) as e:
+            logging.error(f"Error occurred while sending booking confirmation email: {e}")
+            return False
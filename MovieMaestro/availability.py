@@ -0,0 +1,64 @@
+import logging
+from concurrency import batched, fetch_many, DEFAULT_MAX_WORKERS
+
+BULK_CHUNK_SIZE = 100
+# Caps the per-showtime checks one search may cost when there is no bulk endpoint.
+AVAILABILITY_MAX_FANOUT = 200
+# Status codes meaning the upstream has no bulk availability endpoint.
+BULK_UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+
+
+class BulkAvailabilityUnsupported(Exception):
+    pass
+
+
+def check_availability_many(queries, check_one, post_bulk=None, chunk_size=BULK_CHUNK_SIZE,
+                            max_workers=DEFAULT_MAX_WORKERS, max_fanout=None):
+    # queries are (movie_id, showtime, seats) tuples; the result maps each one
+    # to True/False. post_bulk(chunk) answers a whole chunk in one request and
+    # returns availabilities in chunk order; whatever it cannot answer falls
+    # back to check_one per query on a bounded pool. With max_fanout set, at
+    # most that many fall back and the rest are left out of the result, as
+    # are queries whose check raised or gave no answer: only an explicit
+    # false means unavailable.
+    queries = list(dict.fromkeys(tuple(query) for query in queries))
+    results = {}
+
+    if post_bulk is not None:
+        try:
+            for chunk in batched(queries, chunk_size):
+                for query, available in zip(chunk, post_bulk(chunk)):
+                    if available is not None:
+                        results[query] = bool(available)
+        except BulkAvailabilityUnsupported:
+            pass
+        except Exception as e:
+            logging.error(f"Error occurred while checking bulk seat availability: {e}")
+
+    remaining = [query for query in queries if query not in results]
+    if max_fanout is not None:
+        remaining = remaining[:max_fanout]
+    answers = fetch_many(lambda query: _check_or_none(check_one, query), remaining, max_workers)
+    for query, available in zip(remaining, answers):
+        if available is not None:
+            results[query] = bool(available)
+    return results
+
+
+def _check_or_none(check_one, query):
+    try:
+        return check_one(*query)
+    except Exception as e:
+        logging.error(f"Error occurred while checking seat availability: {e}")
+        return None
+
+
+def sold_out_status(movie_id, showtimes, results, seats=1):
+    # Summarizes a schedule row from check_availability_many results;
+    # showtimes that were not checked count as available.
+    sold_out = [showtime for showtime in showtimes if results.get((movie_id, showtime, seats)) is False]
+    if not sold_out:
+        return ""
+    if len(sold_out) == len(showtimes):
+        return "Sold out"
+    return "Sold out: " + ", ".join(sold_out)
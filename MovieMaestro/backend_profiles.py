@@ -0,0 +1,119 @@
+import logging
+
+MOVIES = "movies"
+TICKETING = "ticketing"
+EMAIL = "email"
+SERVICES = (MOVIES, TICKETING, EMAIL)
+
+# How a service is sent its credential: the movie API key as an api_key
+# query parameter, or a token in a bearer Authorization header. None sends
+# nothing.
+API_KEY_AUTH = "api_key"
+BEARER_AUTH = "bearer"
+
+PROFILE_CONFIG_KEY = "BACKEND_PROFILE"
+# true when the ticketing system's bookings endpoint checks availability itself
+COMBINED_BOOKING_CONFIG_KEY = "COMBINED_BOOKING"
+# Config keys that point a single service somewhere else, e.g. a stub.
+URL_CONFIG_KEYS = {
+    MOVIES: "MOVIES_API_URL",
+    TICKETING: "TICKETING_API_URL",
+    EMAIL: "EMAIL_API_URL"
+}
+# Config keys holding each service's credential.
+CREDENTIAL_CONFIG_KEYS = {
+    MOVIES: "MOVIE_API_KEY",
+    TICKETING: "TICKETING_SYSTEM_AUTH_TOKEN",
+    EMAIL: "EMAIL_SERVICE_AUTH_TOKEN"
+}
+
+
+class BackendProfile:
+    # Where each service lives and how it authenticates, so one client can
+    # talk to any deployment.
+    def __init__(self, name, base_urls, auth, customer_id=None, combined_booking=False):
+        self.name = name
+        self.base_urls = dict(base_urls)
+        self.auth = dict(auth)
+        # Sent with bookings by ticketing systems that require one
+        self.customer_id = customer_id
+        # Set when the bookings endpoint can check availability and book in
+        # one request
+        self.combined_booking = combined_booking
+
+    @classmethod
+    def single_host(cls, base_url, name="single-host"):
+        # Every service behind one host with only the movie API key, like the
+        # stub server.
+        return cls(name, {service: base_url for service in SERVICES}, {MOVIES: API_KEY_AUTH})
+
+    def with_urls(self, **base_urls):
+        return BackendProfile(self.name, dict(self.base_urls, **base_urls), self.auth, self.customer_id,
+                              self.combined_booking)
+
+    def with_combined_booking(self, combined_booking):
+        return BackendProfile(self.name, self.base_urls, self.auth, self.customer_id, combined_booking)
+
+    @property
+    def cache_namespace(self):
+        # Cached responses all come from the movie API, so its host tells
+        # one backend's catalogue from another's.
+        return self.base_urls[MOVIES]
+
+    def url(self, service, endpoint):
+        return f"{self.base_urls[service]}{endpoint}"
+
+    def auth_params(self, service, credentials):
+        if self.auth.get(service) == API_KEY_AUTH:
+            return {"api_key": credentials.get(service)}
+        return {}
+
+    def auth_headers(self, service, credentials):
+        if self.auth.get(service) == BEARER_AUTH:
+            return {"Authorization": f"Bearer {credentials.get(service)}"}
+        return {}
+
+
+PROFILES = {
+    # One API gateway for movies, ticketing and email
+    "gateway": BackendProfile(
+        "gateway",
+        {MOVIES: "https://api.example.com", TICKETING: "https://api.example.com", EMAIL: "https://api.example.com"},
+        {MOVIES: API_KEY_AUTH}
+    ),
+    # The movie database, ticketing system and email service on their own
+    # hosts, the latter two with bearer tokens
+    "services": BackendProfile(
+        "services",
+        {MOVIES: "https://api.movies.com", TICKETING: "https://api.ticketing-system.com",
+         EMAIL: "https://api.email-service.com"},
+        {MOVIES: API_KEY_AUTH, TICKETING: BEARER_AUTH, EMAIL: BEARER_AUTH},
+        customer_id="CUSTOMER_ID"
+    )
+}
+DEFAULT_PROFILE = "gateway"
+
+
+def get_profile(name, default=DEFAULT_PROFILE):
+    profile = PROFILES.get(name)
+    if profile is None:
+        logging.error(f"Unknown backend profile {name!r}, using {default!r}")
+        profile = PROFILES[default]
+    return profile
+
+
+def profile_from_config(config, default=DEFAULT_PROFILE):
+    # BACKEND_PROFILE names the profile; *_API_URL keys override its hosts
+    # and COMBINED_BOOKING its booking mode.
+    profile = get_profile(config.get(PROFILE_CONFIG_KEY) or default, default)
+    overrides = {service: config[key] for service, key in URL_CONFIG_KEYS.items() if config.get(key)}
+    if overrides:
+        profile = profile.with_urls(**overrides)
+    combined_booking = config.get(COMBINED_BOOKING_CONFIG_KEY)
+    if combined_booking is not None:
+        profile = profile.with_combined_booking(str(combined_booking).lower() in ("true", "1", "yes"))
+    return profile
+
+
+def credentials_from_config(config):
+    return {service: config.get(key) for service, key in CREDENTIAL_CONFIG_KEYS.items()}
@@ -0,0 +1,229 @@
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from api_client import APIClient
+from booking_pipeline import BookingPipeline
+from config_service import get_config_service
+from email_outbox import EmailOutbox, EMAIL_OUTBOX_FILE
+
+ENCRYPTED_CONFIG_FILE = "encrypted_config.json"
+KEY_FILE = "key.key"
+DEFAULT_WORKERS = 8
+# Requests submitted ahead of the workers; bounds memory on large files.
+QUEUE_DEPTH_PER_WORKER = 4
+
+
+class BookingRequest:
+    __slots__ = ("line", "movie_id", "date", "showtime", "seats", "idempotency_key", "error")
+
+    def __init__(self, line, movie_id, date, showtime, seats, idempotency_key, error=None):
+        self.line = line
+        self.movie_id = movie_id
+        self.date = date
+        self.showtime = showtime
+        self.seats = seats
+        self.idempotency_key = idempotency_key
+        # Why the line could not be read; such requests are reported invalid
+        self.error = error
+
+
+def _idempotency_key(run_id, line, movie_id, date, showtime, seats):
+    # Derived from the run and the request's place in its file, so re-running
+    # the same batch produces the same keys and the ticketing system can drop
+    # repeats, while another batch or another day's showing gets its own.
+    text = f"{run_id}:{line}:{movie_id}:{date}:{showtime}:{seats}"
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def read_booking_requests(path, run_id=None):
+    # CSV needs a header with movie_id, showtime and seats; JSON Lines holds
+    # one object per line with the same fields. Either may carry the booking
+    # date and its own idempotency_key. A line that cannot be read yields a
+    # request without fields, which is reported invalid instead of stopping
+    # the batch. Without a run id the file's absolute path stands in for it.
+    run_id = run_id or os.path.abspath(path)
+    with open(path, newline="") as requests_file:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = ((line, text) for line, text in enumerate(requests_file, 1) if text.strip())
+        else:
+            rows = enumerate(csv.DictReader(requests_file), 2)
+        for line, row in rows:
+            try:
+                if isinstance(row, str):
+                    row = json.loads(row)
+                movie_id, date = row.get("movie_id"), row.get("date")
+                showtime, seats = row.get("showtime"), row.get("seats")
+            except (ValueError, AttributeError) as e:
+                logging.error(f"Error occurred while reading booking request on line {line}: {e}")
+                yield BookingRequest(line, None, None, None, None, _idempotency_key(run_id, line, None, None, None, None),
+                                     error=f"Unreadable request: {e}")
+                continue
+            key = row.get("idempotency_key") or _idempotency_key(run_id, line, movie_id, date, showtime, seats)
+            yield BookingRequest(line, movie_id, date, showtime, seats, key)
+
+
+def load_completed_keys(results_path):
+    # Idempotency keys already booked according to an earlier run's results.
+    completed = set()
+    if not os.path.exists(results_path):
+        return completed
+    with open(results_path) as results_file:
+        for text in results_file:
+            try:
+                record = json.loads(text)
+            except ValueError:
+                continue
+            if record.get("status") == "booked":
+                completed.add(record.get("idempotency_key"))
+    return completed
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class BatchBooker:
+    # Runs booking requests concurrently without any UI: each one goes
+    # through the same BookingPipeline the windows use and produces one
+    # result record. Records are handed to on_result as they complete.
+    def __init__(self, client, max_workers=DEFAULT_WORKERS, outbox=None, on_result=None):
+        self.client = client
+        self.max_workers = max_workers
+        self.outbox = outbox
+        self.on_result = on_result
+        self.pipeline = BookingPipeline(client, max_workers=1)
+
+    def run(self, booking_requests, completed_keys=()):
+        completed_keys = set(completed_keys)
+        counts = {}
+        latencies = []
+        started_at = time.perf_counter()
+
+        def record(result):
+            # Always called on the caller's thread
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if result["latency_ms"] is not None:
+                latencies.append(result["latency_ms"])
+            if self.on_result is not None:
+                self.on_result(result)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-booking") as executor:
+            pending = set()
+            for request in booking_requests:
+                if request.idempotency_key in completed_keys:
+                    record(self._result(request, "skipped"))
+                    continue
+                if len(pending) >= self.max_workers * QUEUE_DEPTH_PER_WORKER:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+                pending.add(executor.submit(self._book, request))
+            for future in pending:
+                record(future.result())
+
+        elapsed = time.perf_counter() - started_at
+        latencies.sort()
+        attempted = len(latencies)
+        return {
+            "total": sum(counts.values()),
+            "statuses": counts,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(attempted / elapsed, 2) if elapsed > 0 else None,
+            "latency_ms": {
+                "p50": _percentile(latencies, 0.50),
+                "p95": _percentile(latencies, 0.95),
+                "p99": _percentile(latencies, 0.99),
+                "max": latencies[-1] if latencies else None
+            }
+        }
+
+    def _book(self, request):
+        try:
+            seats = int(request.seats)
+        except (TypeError, ValueError):
+            seats = 0
+        if not request.movie_id or not request.showtime or seats <= 0:
+            return self._result(request, "invalid", error=request.error)
+
+        started_at = time.perf_counter()
+        try:
+            status = self.pipeline.book(request.movie_id, request.showtime, seats,
+                                        idempotency_key=request.idempotency_key)
+            error = None
+        except Exception as e:
+            status, error = "failed", str(e)
+        latency_ms = round((time.perf_counter() - started_at) * 1000, 1)
+
+        if status == "booked" and self.outbox is not None:
+            self.outbox.enqueue(request.movie_id, request.showtime, seats, dedupe_key=request.idempotency_key)
+        return self._result(request, status, latency_ms, error)
+
+    def _result(self, request, status, latency_ms=None, error=None):
+        return {
+            "line": request.line,
+            "idempotency_key": request.idempotency_key,
+            "movie_id": request.movie_id,
+            "date": request.date,
+            "showtime": request.showtime,
+            "seats": request.seats,
+            "status": status,
+            "latency_ms": latency_ms,
+            "error": error
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Book tickets in bulk from a CSV or JSON Lines file.")
+    parser.add_argument("requests_file")
+    parser.add_argument("--results", help="JSON Lines file the result records are appended to")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--run-id", help="identifies this batch in the idempotency keys; "
+                                         "defaults to the requests file's absolute path")
+    parser.add_argument("--config", default=ENCRYPTED_CONFIG_FILE)
+    parser.add_argument("--key", default=KEY_FILE)
+    args = parser.parse_args(argv)
+
+    config = get_config_service(args.config, args.key).get_config()
+    if config is None:
+        logging.error("Failed to load configuration file.")
+        return 1
+    client = APIClient.from_config(config)
+    # Confirmations are queued durably; whatever is not sent before exit is
+    # delivered by the next process that drains the outbox
+    outbox = EmailOutbox(EMAIL_OUTBOX_FILE, client.send_booking_confirmation_email)
+    outbox.start()
+
+    # Requests already booked by an earlier run over the same file are skipped
+    results_path = args.results or os.path.splitext(args.requests_file)[0] + ".results.jsonl"
+    completed_keys = load_completed_keys(results_path)
+
+    with open(results_path, "a") as results_file:
+        done = 0
+
+        def write_result(result):
+            nonlocal done
+            done += 1
+            results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+            print(f"[{done}] line {result['line']}: {result['status']}", file=sys.stderr)
+
+        booker = BatchBooker(client, args.workers, outbox=outbox, on_result=write_result)
+        summary = booker.run(read_booking_requests(args.requests_file, args.run_id), completed_keys)
+
+    outbox.stop(timeout=5)
+    summary["emails_pending"] = outbox.pending_count()
+
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
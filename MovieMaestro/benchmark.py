@@ -0,0 +1,333 @@
+import argparse
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from api_client import APIClient
+from backend_profiles import BackendProfile
+from booking_pipeline import BookingPipeline
+from cache import ResponseCache
+from http_transport import HTTPTransport
+from records import MovieDetails, decode_schedules, json_decoder_name, set_json_decoder
+from search_index import MovieSearchIndex
+from stub_server import StubAPIServer, DEFAULT_SCHEDULE_COUNT
+
+DEFAULT_ITERATIONS = 200
+DEFAULT_CONCURRENCY = 8
+DEFAULT_LATENCY = 0.005
+MEMORY_ITERATIONS = 20
+SYNC_CHANGES_PER_REFETCH = 5
+DECODE_PAYLOAD_REPEAT = 10
+SEARCH_INDEX_MOVIES = 30000
+SEARCH_SYLLABLES = ("ka", "ro", "mi", "ten", "sha", "dow", "ver", "lin", "gar", "pol",
+                    "que", "zen", "tor", "bel", "an", "ix", "um", "or", "el", "fa")
+BENCH_OUTPUT_FILE = "benchmark_results.json"
+# The stub is local, so the client-side rate limit would only measure itself.
+UNLIMITED_RATE = (1e9, 1e9)
+# Setup fetches can hit injected errors too; each is tried this many times.
+SETUP_ATTEMPTS = 3
+
+
+class SetupFailed(Exception):
+    pass
+
+
+def _setup_fetch(fetch, what):
+    for _ in range(SETUP_ATTEMPTS):
+        value = fetch()
+        if value:
+            return value
+    raise SetupFailed(f"setup failed: could not fetch {what}")
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def run_scenario(func, iterations, concurrency):
+    # func(i) is one operation; a falsy result or an exception counts as an
+    # error. Latency is measured untraced; peak memory comes from a shorter
+    # second pass under tracemalloc, which would otherwise skew the timings.
+    def timed(i):
+        started_at = time.perf_counter()
+        try:
+            ok = bool(func(i))
+        except Exception:
+            ok = False
+        return (time.perf_counter() - started_at) * 1000, ok
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(iterations)))
+    elapsed = time.perf_counter() - started_at
+
+    tracemalloc.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(iterations, iterations + min(iterations, MEMORY_ITERATIONS))))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, ok in results if not ok),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(iterations / elapsed, 1) if elapsed > 0 else None,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50), 2),
+            "p95": round(_percentile(latencies, 0.95), 2),
+            "p99": round(_percentile(latencies, 0.99), 2),
+            "max": round(latencies[-1], 2)
+        },
+        "peak_memory_kb": round(peak / 1024, 1)
+    }
+
+
+def _schedule_table_scenario(make_client):
+    # Times filling the virtualized schedule table the way MainWindow does.
+    # Needs a display; returns None without one.
+    try:
+        import tkinter as tk
+        from virtual_table import VirtualTable
+        root = tk.Tk()
+    except Exception:
+        return None
+    root.withdraw()
+    client = make_client()
+    try:
+        schedules = _setup_fetch(lambda: client.get_movie_schedules("bench", "2024-01-01"), "the schedules")
+    except SetupFailed:
+        root.destroy()
+        raise
+    details = client.get_movie_details_many([schedule.movie_id for schedule in schedules])
+
+    def fill_table(_):
+        table = VirtualTable(root, columns=("Index", "Title", "Duration", "Showtimes", "Status"))
+        table.append_rows((index, movie.title, movie.duration, ", ".join(schedule.showtimes), "")
+                          for index, (schedule, movie) in enumerate(zip(schedules, details)))
+        root.update_idletasks()
+        table.destroy()
+        return True
+
+    return fill_table, root
+
+
+def _movie_search_scenario(movie_count, seed=0):
+    # Search-as-you-type over a synthetic catalogue: every prefix of a title
+    # word, then the word with one letter swapped.
+    rng = random.Random(seed)
+
+    def word():
+        return "".join(rng.choice(SEARCH_SYLLABLES) for _ in range(rng.randint(1, 4)))
+
+    index = MovieSearchIndex()
+    index.add_many(MovieDetails(f"m{i}", " ".join(word().title() for _ in range(rng.randint(1, 4))), 90,
+                                " ".join(word() for _ in range(60)))
+                   for i in range(movie_count))
+    queries = []
+    for _ in range(50):
+        typed = word() + word()
+        queries.extend(typed[:length] for length in range(1, len(typed) + 1))
+        queries.append(typed[:1] + typed[2:3] + typed[1:2] + typed[3:])
+    return lambda i: index.search(queries[i % len(queries)]) is not None
+
+
+def run_benchmarks(stub, iterations=DEFAULT_ITERATIONS, concurrency=DEFAULT_CONCURRENCY, only=None):
+    transport = HTTPTransport(pool_connections=concurrency, pool_maxsize=concurrency, retries=0,
+                              rate_limits={"127.0.0.1": UNLIMITED_RATE})
+
+    def make_client():
+        # A fresh cache per client keeps every measured call cold
+        return APIClient("bench", transport=transport, cache=ResponseCache(),
+                         profile=BackendProfile.single_host(stub.base_url))
+
+    shared = make_client()
+    pipeline = BookingPipeline(shared)
+    sync_locations = [f"S{i}" for i in range(concurrency)]
+
+    # Each scenario is built by a setup function, so only the scenarios
+    # selected with --only fetch what they need
+    def sample_schedule():
+        return _setup_fetch(lambda: shared.get_movie_schedules("bench", "2024-01-01"), "the sample schedules")[0]
+
+    def availability_scenario():
+        showtimes = sample_schedule().showtimes
+        queries = [(f"m{i}", showtime, 1) for i in range(20) for showtime in showtimes]
+        return lambda i: shared.check_seat_availability_many(queries)
+
+    def booking_scenario():
+        showtime = sample_schedule().showtimes[0]
+        return lambda i: pipeline.book(f"m{i}", showtime, 2) == "booked"
+
+    def email_scenario():
+        showtime = sample_schedule().showtimes[0]
+        return lambda i: shared.send_booking_confirmation_email(f"m{i}", showtime, 2)
+
+    # Refetches after the cached copy expired: a fresh client downloads the
+    # whole list, a primed one gets a 304, or a delta when the stub changed
+    # a few schedules in between
+    def primed_client(delta_sync):
+        client = make_client()
+        client.delta_sync = delta_sync
+        for location in sync_locations:
+            _setup_fetch(lambda: client.get_movie_schedules(location, "2024-01-01"), f"the schedules for {location}")
+        return client
+
+    def refetch(client, location, changes=0):
+        if changes:
+            stub.mutate_schedules(location, "2024-01-01", changes)
+        client.cache.invalidate("schedules", (location, "2024-01-01"))
+        return client.get_movie_schedules(location, "2024-01-01")
+
+    def refetch_scenario(delta_sync, changes):
+        client = primed_client(delta_sync)
+        return lambda i: refetch(client, sync_locations[i % concurrency], changes)
+
+    # Decoding alone, on the payload of a large multiplex
+    def decode_scenario():
+        schedule_payload = json.dumps(stub.schedules("bench", "2024-01-01") * DECODE_PAYLOAD_REPEAT).encode()
+        return lambda i: decode_schedules(schedule_payload)
+
+    scenarios = {
+        "schedule_decode": decode_scenario,
+        "movie_schedules": lambda: lambda i: make_client().get_movie_schedules(f"L{i}", "2024-01-01"),
+        "schedule_stream": lambda: lambda i: sum(len(batch) for batch, _ in make_client().iter_schedule_batches(f"L{i}", "2024-01-01")),
+        "schedule_refetch_full": lambda: lambda i: refetch(make_client(), sync_locations[i % concurrency]),
+        "schedule_refetch_not_modified": lambda: refetch_scenario(False, 0),
+        "schedule_refetch_delta": lambda: refetch_scenario(True, SYNC_CHANGES_PER_REFETCH),
+        "movie_details": lambda: lambda i: make_client().get_movie_details(f"m{i}"),
+        "seat_availability_bulk": availability_scenario,
+        "booking": booking_scenario,
+        "confirmation_email": email_scenario
+    }
+
+    results = {}
+    for name, setup in scenarios.items():
+        if only and name not in only:
+            continue
+        try:
+            func = setup()
+        except SetupFailed as e:
+            results[name] = {"skipped": str(e)}
+            continue
+        # Fewer iterations for scenarios that move a whole schedule each time
+        scenario_iterations = max(iterations // 10, 1) if name == "schedule_stream" else iterations
+        sent_before = sum(stub.bytes_sent().values())
+        results[name] = run_scenario(func, scenario_iterations, concurrency)
+        calls = scenario_iterations + min(scenario_iterations, MEMORY_ITERATIONS)
+        results[name]["response_bytes_per_call"] = round((sum(stub.bytes_sent().values()) - sent_before) / calls)
+
+    if not only or "movie_search" in only:
+        results["movie_search"] = run_scenario(_movie_search_scenario(SEARCH_INDEX_MOVIES), iterations, 1)
+
+    if not only or "schedule_table" in only:
+        try:
+            table = _schedule_table_scenario(make_client)
+        except SetupFailed as e:
+            results["schedule_table"] = {"skipped": str(e)}
+        else:
+            if table is None:
+                results["schedule_table"] = {"skipped": "no display available"}
+            else:
+                fill_table, root = table
+                results["schedule_table"] = run_scenario(fill_table, max(iterations // 10, 1), 1)
+                root.destroy()
+
+    transport.close()
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(baseline, current):
+    lines = []
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "latency_ms" not in before or "latency_ms" not in result:
+            continue
+        changes = []
+        for label, old, new in (("p50", before["latency_ms"]["p50"], result["latency_ms"]["p50"]),
+                                ("p95", before["latency_ms"]["p95"], result["latency_ms"]["p95"]),
+                                ("throughput", before["throughput_per_s"], result["throughput_per_s"]),
+                                ("bytes", before.get("response_bytes_per_call"), result.get("response_bytes_per_call"))):
+            # A metric either side did not record is left out
+            if old and new is not None:
+                changes.append(f"{label} {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+        if changes:
+            lines.append(f"{name}: " + ", ".join(changes))
+    return "\n".join(lines)
+
+
+def _positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the client paths against a local stub API.")
+    parser.add_argument("--iterations", type=_positive_int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--concurrency", type=_positive_int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="stub seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--schedules", type=int, default=DEFAULT_SCHEDULE_COUNT, help="schedules per search")
+    parser.add_argument("--stdlib-json", action="store_true", help="decode with the json module even if orjson is installed")
+    parser.add_argument("--compress", action="store_true", help="have the stub gzip responses")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--output", default=BENCH_OUTPUT_FILE)
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    # Injected failures are counted per scenario instead of logged one by one
+    logging.disable(logging.ERROR)
+    if args.stdlib_json:
+        set_json_decoder(json.loads)
+
+    stub = StubAPIServer(latency=args.latency, error_rate=args.error_rate, schedule_count=args.schedules,
+                         compress=args.compress).start()
+    try:
+        scenarios = run_benchmarks(stub, args.iterations, args.concurrency, args.only)
+    finally:
+        stub.stop()
+
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "latency_s": args.latency,
+            "error_rate": args.error_rate,
+            "schedules": args.schedules,
+            "compress": args.compress,
+            "json_decoder": json_decoder_name()
+        },
+        "scenarios": scenarios
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(json.dumps(scenarios, indent=2))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            print(compare(json.load(baseline_file), report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
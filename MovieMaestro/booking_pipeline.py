@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 4
+# A speculative availability answer older than this is not trusted for booking.
+AVAILABILITY_MAX_AGE = 30.0
+
+
+class BookingPipeline:
+    # Overlaps the booking round trips with the user's think time: seat
+    # availability for every showtime of a schedule is checked while the user
+    # is still choosing one, so confirming usually costs only the booking call.
+    # Upstreams that check and book in one request skip the check entirely.
+    def __init__(self, client, max_workers=DEFAULT_MAX_WORKERS, clock=time.monotonic):
+        self.client = client
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="booking")
+        self._availability = {}
+        self._lock = threading.Lock()
+
+    def prefetch_availability(self, movie_id, showtimes, seats):
+        if getattr(self.client, "combined_booking", False):
+            return
+        now = self.clock()
+        with self._lock:
+            for key in [key for key, (started_at, _) in self._availability.items()
+                        if now - started_at > AVAILABILITY_MAX_AGE]:
+                del self._availability[key]
+            for showtime in showtimes:
+                key = (movie_id, showtime, seats)
+                if key not in self._availability:
+                    future = self._executor.submit(self.client.check_seat_availability, movie_id, showtime, seats)
+                    self._availability[key] = (now, future)
+
+    def check_availability(self, movie_id, showtime, seats):
+        key = (movie_id, showtime, seats)
+        with self._lock:
+            prefetched = self._availability.pop(key, None)
+        if prefetched is not None:
+            started_at, future = prefetched
+            if self.clock() - started_at <= AVAILABILITY_MAX_AGE:
+                return future.result()
+        return self.client.check_seat_availability(movie_id, showtime, seats)
+
+    def book(self, movie_id, showtime, seats, idempotency_key=None):
+        # Returns "booked", "unavailable" or "failed". An idempotency key lets
+        # the ticketing system drop a booking request it has already served.
+        if getattr(self.client, "combined_booking", False):
+            return self.client.check_and_book(movie_id, showtime, seats, idempotency_key=idempotency_key)
+
+        if not self.check_availability(movie_id, showtime, seats):
+            return "unavailable"
+        if not self.client.make_ticket_booking(movie_id, showtime, seats, idempotency_key=idempotency_key):
+            return "failed"
+        return "booked"
+
+    def discard(self, movie_id=None):
+        with self._lock:
+            for key in [key for key in self._availability if movie_id is None or key[0] == movie_id]:
+                self._availability.pop(key)[1].cancel()
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import annotate
+
+DEFAULT_MAX_ENTRIES = 2048
+
+# endpoint: (seconds an entry is fresh, further seconds a stale copy may be
+# served while it is refreshed in the background)
+ENDPOINT_TTLS = {
+    "schedules": (300, 1800),
+    "movie_details": (3600, 86400)
+}
+
+
+class CacheEntry:
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value, fresh_until, stale_until):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class ResponseCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttls=None, clock=time.monotonic, backing=None):
+        self.max_entries = max_entries
+        self.backing = backing
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.fallbacks = 0
+
+    def get_or_load(self, endpoint, args, loader):
+        key = (endpoint,) + tuple(args)
+        found, value, expired = self._lookup(key, loader)
+        if found:
+            return value
+
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        elif expired is not None:
+            # The upstream failed or is shut off by its circuit breaker; an
+            # expired copy is better than nothing.
+            with self._lock:
+                self.fallbacks += 1
+            annotate(cache="fallback")
+            return expired
+        return value
+
+    def lookup(self, endpoint, args, loader):
+        # Same lookup as get_or_load (memory, then backing store, refreshing
+        # stale entries through loader) but returns None on a miss instead of
+        # loading, for callers that fetch the value themselves.
+        found, value, _ = self._lookup((endpoint,) + tuple(args), loader)
+        return value if found else None
+
+    def set(self, key, value):
+        ttl, stale_ttl = self.ttls[key[0]]
+        now = self.clock()
+        with self._lock:
+            self._entries[key] = CacheEntry(value, now + ttl, now + ttl + stale_ttl)
+            self._entries.move_to_end(key)
+            self._evict_overflow()
+
+        if self.backing is not None:
+            try:
+                self.backing.set(key, value, ttl)
+            except Exception as e:
+                logging.error(f"Error occurred while persisting cached response: {e}")
+
+    def invalidate(self, endpoint, args):
+        with self._lock:
+            self._entries.pop((endpoint,) + tuple(args), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "fallbacks": self.fallbacks,
+                "size": len(self._entries)
+            }
+
+    def _lookup(self, key, loader):
+        now = self.clock()
+        expired = None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry.fresh_until:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    annotate(cache="hit")
+                    return True, entry.value, None
+                if now < entry.stale_until:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    self._schedule_refresh(key, loader)
+                    annotate(cache="stale")
+                    return True, entry.value, None
+                # Kept until a reload replaces it, as a last resort
+                expired = entry.value
+
+        if self.backing is not None:
+            try:
+                persisted = self.backing.get(key)
+            except Exception as e:
+                logging.error(f"Error occurred while reading persisted response: {e}")
+                persisted = None
+            if persisted is not None:
+                annotate(cache="disk")
+                return True, self._restore(key, loader, *persisted), None
+
+        with self._lock:
+            self.misses += 1
+        annotate(cache="miss")
+        return False, None, expired
+
+    def _restore(self, key, loader, value, expires_at):
+        _, stale_ttl = self.ttls[key[0]]
+        now = self.clock()
+        remaining = expires_at - self.backing.clock()
+        with self._lock:
+            self.disk_hits += 1
+            if remaining > 0:
+                self._entries[key] = CacheEntry(value, now + remaining, now + remaining + stale_ttl)
+            else:
+                # Expired on disk: show it right away and revalidate behind it.
+                self._entries[key] = CacheEntry(value, now, now + stale_ttl)
+                self._schedule_refresh(key, loader)
+            self._entries.move_to_end(key)
+            self._evict_overflow()
+        return value
+
+    def _evict_overflow(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _schedule_refresh(self, key, loader):
+        # Called with the lock held; at most one refresh per key is in flight.
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        self._refresh_executor.submit(self._refresh, key, loader)
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+                with self._lock:
+                    self.refreshes += 1
+        except Exception as e:
+            logging.error(f"Error occurred while refreshing cached response: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
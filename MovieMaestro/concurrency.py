@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def fetch_many(fetch, keys, max_workers=DEFAULT_MAX_WORKERS):
+    # Each distinct key is fetched once; duplicates share the result and the
+    # returned list lines up with the keys as given.
+    keys = list(keys)
+    unique_keys = list(dict.fromkeys(keys))
+    if not unique_keys:
+        return []
+
+    workers = min(max_workers, len(unique_keys))
+    if workers <= 1:
+        results = {key: fetch(key) for key in unique_keys}
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = dict(zip(unique_keys, executor.map(fetch, unique_keys)))
+
+    return [results[key] for key in keys]
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
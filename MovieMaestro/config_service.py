@@ -0,0 +1,115 @@
+import functools
+import json
+import logging
+import os
+import threading
+
+
+@functools.lru_cache(maxsize=8)
+def get_fernet(encryption_key):
+    # cryptography is imported on first use so it stays off the startup path
+    from cryptography.fernet import Fernet
+    return Fernet(encryption_key)
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ConfigService:
+    # Loads the key and decrypts the config once, then serves both from memory
+    # until either file changes on disk.
+    def __init__(self, config_file_path, key_file_path):
+        self.config_file_path = config_file_path
+        self.key_file_path = key_file_path
+        self._lock = threading.RLock()
+        self._key = None
+        self._key_stamp = None
+        self._config = None
+        self._config_stamp = None
+
+    def get_key(self):
+        with self._lock:
+            stamp = _file_stamp(self.key_file_path)
+            if stamp is None:
+                logging.error(f"Encryption key file not found: {self.key_file_path}")
+                self._key = self._key_stamp = None
+                return None
+            if stamp != self._key_stamp:
+                try:
+                    with open(self.key_file_path, "rb") as key_file:
+                        self._key = key_file.read()
+                    self._key_stamp = stamp
+                    self._config_stamp = None
+                except Exception as e:
+                    logging.error(f"Error occurred while loading encryption key: {e}")
+                    return None
+            return self._key
+
+    def get_fernet(self):
+        key = self.get_key()
+        if key is None:
+            return None
+        try:
+            return get_fernet(key)
+        except Exception as e:
+            logging.error(f"Error occurred while loading encryption key: {e}")
+            return None
+
+    def get_config(self):
+        with self._lock:
+            fernet = self.get_fernet()
+            if fernet is None:
+                return None
+
+            stamp = _file_stamp(self.config_file_path)
+            if stamp is None:
+                logging.error(f"Config file not found: {self.config_file_path}")
+                return None
+            if stamp != self._config_stamp:
+                try:
+                    with open(self.config_file_path, "rb") as config_file:
+                        encrypted_config = config_file.read()
+                    self._config = json.loads(fernet.decrypt(encrypted_config).decode())
+                    self._config_stamp = stamp
+                except Exception as e:
+                    logging.error(f"Error occurred while decrypting config: {e}")
+                    return None
+            return dict(self._config)
+
+    def save_config(self, config):
+        with self._lock:
+            fernet = self.get_fernet()
+            if fernet is None:
+                return False
+            try:
+                with open(self.config_file_path, "wb") as config_file:
+                    config_file.write(fernet.encrypt(json.dumps(config).encode()))
+                self._config = dict(config)
+                self._config_stamp = _file_stamp(self.config_file_path)
+                return True
+            except Exception as e:
+                logging.error(f"Error occurred while encrypting config: {e}")
+                return False
+
+    def invalidate(self):
+        with self._lock:
+            self._key_stamp = None
+            self._config_stamp = None
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_config_service(config_file_path, key_file_path):
+    key = (os.path.abspath(config_file_path), os.path.abspath(key_file_path))
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = ConfigService(config_file_path, key_file_path)
+        return service
@@ -0,0 +1,150 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from records import record_to_json, RESPONSE_DECODERS
+
+RESPONSE_CACHE_FILE = "response_cache.db"
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# How long a persisted response may still be shown (stale) after it expired,
+# e.g. yesterday's catalogue on a kiosk that was switched off overnight.
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+COMPACT_EVERY_WRITES = 500
+
+
+class DiskCache:
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age=DEFAULT_MAX_AGE, clock=time.time, decoders=RESPONSE_DECODERS, namespace=None):
+        self.path = path
+        # Keeps the responses of different backends apart in one file
+        self.namespace = namespace
+        # Values are stored as plain JSON and turned back into records on read
+        self.decoders = decoders
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._writes_since_compact = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "stored_at REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+        self.compact()
+
+    def get(self, key):
+        now = self.clock()
+        db_key = self._db_key(key)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (db_key, now - self.max_age)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, db_key))
+            self._conn.commit()
+        value = json.loads(row[0])
+        decoder = self.decoders.get(key[0]) if self.decoders else None
+        if decoder is not None:
+            try:
+                value = decoder(value)
+            except ValueError as e:
+                logging.error(f"Error occurred while reading cached response: {e}")
+                return None
+        return value, row[1]
+
+    def iter_values(self, endpoint):
+        # Every value still kept for the endpoint, e.g. to rebuild an index
+        # from the last session's responses. Rows are read up front.
+        prefix = self._db_key((endpoint,))[:-1] + ","
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value FROM responses WHERE substr(key, 1, ?) = ? AND expires_at > ?",
+                (len(prefix), prefix, self.clock() - self.max_age)
+            ).fetchall()
+        decoder = self.decoders.get(endpoint) if self.decoders else None
+        for (data,) in rows:
+            value = json.loads(data)
+            if decoder is not None:
+                try:
+                    value = decoder(value)
+                except ValueError as e:
+                    logging.error(f"Error occurred while reading cached response: {e}")
+                    continue
+            yield value
+
+    def set(self, key, value, ttl):
+        now = self.clock()
+        data = json.dumps(value, default=record_to_json)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, stored_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self._db_key(key), data, len(data), now, now + ttl, now)
+            )
+            self._conn.commit()
+            self._writes_since_compact += 1
+            compact_due = self._writes_since_compact >= COMPACT_EVERY_WRITES
+        if compact_due:
+            self.compact()
+
+    def _db_key(self, key):
+        if self.namespace is None:
+            return json.dumps(list(key))
+        return json.dumps([self.namespace, *key])
+
+    def compact(self):
+        with self._lock:
+            self._writes_since_compact = 0
+            removed = self._conn.execute(
+                "DELETE FROM responses WHERE expires_at <= ?", (self.clock() - self.max_age,)
+            ).rowcount
+
+            count, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            if count > self.max_entries or total_size > self.max_bytes:
+                # Drop least recently used rows until both caps hold again.
+                excess_rows = max(count - self.max_entries, 0)
+                excess_bytes = max(total_size - self.max_bytes, 0)
+                victims = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                    if excess_rows <= 0 and excess_bytes <= 0:
+                        break
+                    victims.append((key,))
+                    excess_rows -= 1
+                    excess_bytes -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                removed += len(victims)
+            self._conn.commit()
+
+            if removed:
+                self._conn.execute("VACUUM")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_disk_cache(path, **kwargs):
+    try:
+        return DiskCache(path, **kwargs)
+    except sqlite3.Error as e:
+        logging.error(f"Error occurred while opening response cache {path}: {e}")
+        return None
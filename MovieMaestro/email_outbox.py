@@ -0,0 +1,142 @@
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrency import fetch_many
+
+EMAIL_OUTBOX_FILE = "email_outbox.db"
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_SEND_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BASE_DELAY = 2.0
+DEFAULT_MAX_DELAY = 300.0
+DEFAULT_POLL_INTERVAL = 5.0
+SENT_RETENTION = 24 * 3600
+
+
+class EmailOutbox:
+    # Booking confirmations are written to SQLite before anything is sent and
+    # drained by a background worker, so the booking never waits on the email
+    # service and unsent mail survives a restart. Each message carries a
+    # dedupe key: re-enqueueing it is a no-op, and it is passed to the sender
+    # as an idempotency key so a retry after a crash is not delivered twice.
+    def __init__(self, path, send, batch_size=DEFAULT_BATCH_SIZE, send_workers=DEFAULT_SEND_WORKERS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 poll_interval=DEFAULT_POLL_INTERVAL, clock=time.time):
+        self.send = send
+        self.batch_size = batch_size
+        self.send_workers = send_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, dedupe_key TEXT NOT NULL UNIQUE, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, created_at REAL NOT NULL, sent_at REAL, last_error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        self._conn.commit()
+
+    def enqueue(self, movie_id, showtime, seats, dedupe_key=None):
+        dedupe_key = dedupe_key or uuid.uuid4().hex
+        now = self.clock()
+        with self._lock:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (dedupe_key, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (dedupe_key, json.dumps([movie_id, showtime, seats]), now, now)
+            ).rowcount
+            self._conn.commit()
+        self._wakeup.set()
+        return inserted == 1
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def drain_once(self):
+        now = self.clock()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, dedupe_key, payload, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, self.batch_size)
+            ).fetchall()
+        if not rows:
+            return 0
+
+        # The whole batch goes out concurrently over the shared keep-alive pool
+        results = fetch_many(self._send_row, rows, self.send_workers)
+
+        now = self.clock()
+        with self._lock:
+            for (row_id, _, _, attempts), (sent, error) in zip(rows, results):
+                if sent:
+                    self._conn.execute(
+                        "UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?", (now, row_id)
+                    )
+                    continue
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    logging.error(f"Giving up on booking confirmation email {row_id} after {attempts} attempts")
+                    self._conn.execute(
+                        "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                        (attempts, error, row_id)
+                    )
+                else:
+                    delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay) * random.uniform(0.5, 1.0)
+                    self._conn.execute(
+                        "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                        (attempts, now + delay, error, row_id)
+                    )
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (now - SENT_RETENTION,)
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def _send_row(self, row):
+        _, dedupe_key, payload, _ = row
+        movie_id, showtime, seats = json.loads(payload)
+        try:
+            if self.send(movie_id, showtime, seats, idempotency_key=dedupe_key):
+                return True, None
+            return False, "send returned failure"
+        except Exception as e:
+            return False, str(e)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                drained = self.drain_once()
+            except Exception as e:
+                logging.error(f"Error occurred while draining email outbox: {e}")
+                drained = 0
+            if drained < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
@@ -1,6 +1,7 @@
 import json
 import logging
 from cryptography.fernet import Fernet
+from config_service import get_config_service, get_fernet
 
 
 class EncryptionHandler:
@@ -31,8 +32,7 @@ class EncryptionHandler:
                 logging.error("Encryption key not loaded.")
                 return
 
-            fernet = Fernet(self.fernet_key)
-            encrypted_config = fernet.encrypt(json.dumps(config).encode())
+            encrypted_config = get_fernet(self.fernet_key).encrypt(json.dumps(config).encode())
 
             with open(encrypted_file_path, "wb") as encrypted_file:
                 encrypted_file.write(encrypted_config)
@@ -45,13 +45,8 @@ class EncryptionHandler:
                 logging.error("Encryption key not loaded.")
                 return
 
-            with open(encrypted_file_path, "rb") as encrypted_file:
-                encrypted_config = encrypted_file.read()
-
-            fernet = Fernet(self.fernet_key)
-            decrypted_config = fernet.decrypt(encrypted_config).decode()
-
-            return json.loads(decrypted_config)
+            # Decrypted once and kept until the file or key changes on disk
+            return get_config_service(encrypted_file_path, self.key_file_path).get_config()
         except Exception as e:
             logging.error(f"Error occurred while decrypting configuration: {e}")
             return None
@@ -0,0 +1,210 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from instrumentation import span
+from resilience import (TokenBucket, CircuitBreaker, RateLimitExceeded, CircuitOpenError, DEFAULT_RATE,
+                        DEFAULT_BURST, DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT)
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.3
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Responses that count against an upstream's circuit breaker.
+FAILURE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.new_connections = 0
+        self.checkouts = 0
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+        # Read back by the request span: a new connection paid for DNS/TCP/TLS
+        self._local.new_connection = True
+
+    def take_new_connection_flag(self):
+        flag = getattr(self._local, "new_connection", False)
+        self._local.new_connection = False
+        return flag
+
+    @property
+    def reused_connections(self):
+        return max(self.checkouts - self.new_connections, 0)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "new_connections": self.new_connections,
+                "reused_connections": max(self.checkouts - self.new_connections, 0),
+                "checkouts": self.checkouts
+            }
+
+
+def _counting_pool_class(base, stats):
+    # urllib3 hands out a pooled connection from _get_conn and only calls
+    # _new_conn when the pool has nothing idle, so the difference is reuse.
+    class CountingConnectionPool(base):
+        def _get_conn(self, timeout=None):
+            stats.record_checkout()
+            return super()._get_conn(timeout)
+
+        def _new_conn(self):
+            stats.record_new_connection()
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool_class(HTTPConnectionPool, self.stats),
+            "https": _counting_pool_class(HTTPSConnectionPool, self.stats)
+        }
+
+
+class HTTPTransport:
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 rate_limits=None, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.timeout = timeout
+        self.stats = ConnectionStats()
+        # host or (host, service): (requests per second, burst); unlisted
+        # hosts get the default
+        self.rate_limits = dict(rate_limits or {})
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._guards = {}
+        self._guards_lock = threading.Lock()
+
+        # Only idempotent methods are retried; a POST that reached the server
+        # (booking, email) must never be replayed behind the caller's back.
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False
+        )
+        adapter = PooledHTTPAdapter(
+            self.stats,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, service=None, **kwargs):
+        # Every upstream host and service gets its own token bucket and circuit
+        # breaker, so behind a shared gateway an email outage does not shut
+        # off bookings. Both refusals raise RequestException subclasses, so
+        # callers fail fast through their usual error handling instead of
+        # waiting on a timeout.
+        host = urlsplit(url).hostname
+        limiter, breaker = self._guard(host, service)
+        upstream = _upstream_name(host, service)
+        kwargs.setdefault("timeout", self.timeout)
+        with span("http.request", method=method, host=host, service=service) as request_span:
+            # The breaker is checked first, so a host that is down neither
+            # spends tokens nor makes callers wait for one
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {upstream}")
+            queued_at = time.perf_counter()
+            if not limiter.acquire():
+                breaker.abandon()
+                raise RateLimitExceeded(f"Rate limit exceeded for {upstream}")
+            request_span.set("rate_limit_wait_ms", round((time.perf_counter() - queued_at) * 1000, 2))
+
+            self.stats.take_new_connection_flag()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except Exception:
+                breaker.record_failure()
+                raise
+            if response.status_code in FAILURE_STATUS_CODES:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            request_span.set("status", response.status_code)
+            request_span.set("new_connection", self.stats.take_new_connection_flag())
+            # Time to response headers: server time plus network round trip
+            request_span.set("time_to_headers_ms", round(response.elapsed.total_seconds() * 1000, 2))
+            size = response.headers.get("Content-Length")
+            if size is None and not kwargs.get("stream"):
+                size = len(response.content)
+            request_span.set("response_bytes", int(size) if size is not None else None)
+        return response
+
+    def get(self, url, service=None, **kwargs):
+        return self.request("GET", url, service, **kwargs)
+
+    def post(self, url, service=None, **kwargs):
+        return self.request("POST", url, service, **kwargs)
+
+    def connection_stats(self):
+        return self.stats.as_dict()
+
+    def upstream_stats(self):
+        with self._guards_lock:
+            guards = dict(self._guards)
+        stats = {}
+        for (host, service), (limiter, breaker) in guards.items():
+            upstream = _upstream_name(host, service)
+            stats[upstream] = breaker.stats()
+            stats[upstream]["throttled"] = limiter.throttled
+            stats[upstream]["rate_limited"] = limiter.refused
+        return stats
+
+    def _guard(self, host, service):
+        key = (host, service)
+        with self._guards_lock:
+            guard = self._guards.get(key)
+            if guard is None:
+                rate, burst = self.rate_limits.get(key, self.rate_limits.get(host, (DEFAULT_RATE, DEFAULT_BURST)))
+                guard = self._guards[key] = (
+                    TokenBucket(rate, burst),
+                    CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                )
+            return guard
+
+    def close(self):
+        self.session.close()
+
+
+def _upstream_name(host, service):
+    return host if service is None else f"{service}@{host}"
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = HTTPTransport()
+        return _default_transport
@@ -0,0 +1,245 @@
+import contextvars
+import functools
+import itertools
+import logging
+import os
+import threading
+import time
+
+TRACE_ENV_VAR = "MOVIEMAESTRO_TRACE"
+# Upper bounds in milliseconds; the last bucket catches everything slower.
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+# inspect.CO_GENERATOR; inspect itself is too slow to import at startup.
+_CO_GENERATOR = 0x20
+
+_exporters = []
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("name", "attributes", "span_id", "parent_id", "start_ns", "duration_ms", "error",
+                 "_started_at", "_token", "_current")
+
+    def __init__(self, name, attributes=None, current=True):
+        self.name = name
+        self.attributes = attributes or {}
+        self.span_id = next(_span_ids)
+        self.parent_id = None
+        self.start_ns = None
+        self.duration_ms = None
+        self.error = None
+        self._started_at = None
+        self._token = None
+        self._current = current
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is not None:
+            self.parent_id = parent.span_id
+        if self._current:
+            self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._started_at) * 1000
+        if self._token is not None:
+            _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        for exporter in list(_exporters):
+            try:
+                exporter.export(self)
+            except Exception as e:
+                logging.error(f"Error occurred while exporting trace span: {e}")
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def enabled():
+    return bool(_exporters)
+
+
+def span(name, **attributes):
+    # With no exporter installed this hands back a shared no-op span, so an
+    # instrumented call pays for one list check.
+    if not _exporters:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def annotate(**attributes):
+    # Adds attributes to the innermost span on this thread, if any.
+    if _exporters:
+        current = _current_span.get()
+        if current is not None:
+            current.attributes.update(attributes)
+
+
+def traced(name=None):
+    # Wraps a function (or generator function) in a span named after it.
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if func.__code__.co_flags & _CO_GENERATOR:
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not _exporters:
+                    yield from func(*args, **kwargs)
+                    return
+                # Not made current: the consumer runs between items
+                with Span(span_name, current=False) as generator_span:
+                    items = 0
+                    for item in func(*args, **kwargs):
+                        items += 1
+                        yield item
+                    generator_span.set("items", items)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _exporters:
+                return func(*args, **kwargs)
+            with Span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def add_exporter(exporter):
+    _exporters.append(exporter)
+    return exporter
+
+
+def remove_exporter(exporter):
+    if exporter in _exporters:
+        _exporters.remove(exporter)
+
+
+class LoggingExporter:
+    def __init__(self, level=logging.INFO):
+        self.level = level
+
+    def export(self, finished_span):
+        attributes = " ".join(f"{key}={value}" for key, value in finished_span.attributes.items())
+        error = f" error={finished_span.error}" if finished_span.error else ""
+        logging.log(self.level, f"span {finished_span.name} {finished_span.duration_ms:.1f}ms {attributes}{error}")
+
+
+class HistogramExporter:
+    # Keeps per-span-name latency buckets in memory.
+    def __init__(self, bounds=HISTOGRAM_BOUNDS_MS):
+        self.bounds = tuple(bounds)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def export(self, finished_span):
+        bucket = len(self.bounds)
+        for index, bound in enumerate(self.bounds):
+            if finished_span.duration_ms <= bound:
+                bucket = index
+                break
+        with self._lock:
+            histogram = self._histograms.get(finished_span.name)
+            if histogram is None:
+                histogram = self._histograms[finished_span.name] = {
+                    "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(self.bounds) + 1)
+                }
+            histogram["count"] += 1
+            histogram["errors"] += finished_span.error is not None
+            histogram["total_ms"] += finished_span.duration_ms
+            histogram["max_ms"] = max(histogram["max_ms"], finished_span.duration_ms)
+            histogram["buckets"][bucket] += 1
+
+    def summary(self):
+        # Percentiles are reported as the upper bound of their bucket, capped
+        # at the slowest span seen.
+        with self._lock:
+            histograms = {name: dict(histogram, buckets=list(histogram["buckets"]))
+                          for name, histogram in self._histograms.items()}
+        summary = {}
+        for name, histogram in histograms.items():
+            summary[name] = {
+                "count": histogram["count"],
+                "errors": histogram["errors"],
+                "mean_ms": round(histogram["total_ms"] / histogram["count"], 2),
+                "p50_ms": self._percentile(histogram, 0.50),
+                "p95_ms": self._percentile(histogram, 0.95),
+                "p99_ms": self._percentile(histogram, 0.99),
+                "max_ms": round(histogram["max_ms"], 2)
+            }
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def _percentile(self, histogram, fraction):
+        target = histogram["count"] * fraction
+        seen = 0
+        for index, count in enumerate(histogram["buckets"]):
+            seen += count
+            if seen >= target and count:
+                if index < len(self.bounds):
+                    return min(self.bounds[index], round(histogram["max_ms"], 2))
+                break
+        return round(histogram["max_ms"], 2)
+
+
+class OpenTelemetryExporter:
+    # Re-emits finished spans through an OpenTelemetry tracer. Needs the
+    # opentelemetry-api package; spans are exported flat, without parents.
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer("moviemaestro")
+        self.tracer = tracer
+
+    def export(self, finished_span):
+        attributes = {key: value for key, value in finished_span.attributes.items()
+                      if isinstance(value, (str, bool, int, float))}
+        if finished_span.error:
+            attributes["error.type"] = finished_span.error
+        otel_span = self.tracer.start_span(finished_span.name, start_time=finished_span.start_ns,
+                                           attributes=attributes)
+        otel_span.end(end_time=finished_span.start_ns + int(finished_span.duration_ms * 1e6))
+
+
+def configure_from_env():
+    # MOVIEMAESTRO_TRACE=log, histogram or otel (comma separated) turns tracing on.
+    exporters = []
+    for kind in filter(None, (part.strip() for part in os.environ.get(TRACE_ENV_VAR, "").split(","))):
+        try:
+            if kind == "log":
+                logging.basicConfig(level=logging.INFO)
+                exporters.append(add_exporter(LoggingExporter()))
+            elif kind == "histogram":
+                exporters.append(add_exporter(HistogramExporter()))
+            elif kind == "otel":
+                exporters.append(add_exporter(OpenTelemetryExporter()))
+            else:
+                logging.error(f"Unknown trace exporter: {kind}")
+        except ImportError as e:
+            logging.error(f"Error occurred while enabling trace exporter {kind}: {e}")
+    return exporters
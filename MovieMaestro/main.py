@@ -1,7 +1,27 @@
-from movie_schedule_bot import MovieScheduleBot
-from main_window import MainWindow
-from api_client import APIClient
+from startup import startup_timer, profile_startup, STARTUP_PROFILE_FLAG, STARTUP_CHILD_FLAG
+import json
+import sys
 
-if __name__ == "__main__":
+
+def main(argv):
+    # --profile-startup re-runs the app under -X importtime and prints where
+    # cold start went: milestones up to the first window plus the slowest imports
+    if STARTUP_PROFILE_FLAG in argv:
+        print(json.dumps(profile_startup(__file__), indent=2))
+        return
+
+    startup_timer.enabled = STARTUP_CHILD_FLAG in argv
+    # Heavy modules are imported here, not at the top, and the window
+    # modules pull in the HTTP stack and crypto only after the first paint
+    from instrumentation import configure_from_env
+    from movie_schedule_bot import MovieScheduleBot
+    startup_timer.mark("imports")
+
+    # Tracing stays off unless MOVIEMAESTRO_TRACE names an exporter
+    configure_from_env()
     bot = MovieScheduleBot()
-    bot.main()
+    bot.main(exit_when_ready=startup_timer.enabled)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
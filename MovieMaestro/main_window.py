@@ -1,38 +1,41 @@
+import os
+import threading
 import tkinter as tk
+import uuid
 from tkinter import ttk, messagebox
-from api_client import APIClient
-from utils import load_config, load_encryption_key, decrypt_config
+from availability import sold_out_status, AVAILABILITY_MAX_FANOUT
+from backend_profiles import profile_from_config
+from booking_pipeline import BookingPipeline
+from cache import ResponseCache
+from concurrency import DEFAULT_MAX_WORKERS
+from config_service import get_config_service
+from disk_cache import open_disk_cache, RESPONSE_CACHE_FILE
+from email_outbox import EmailOutbox, EMAIL_OUTBOX_FILE
+from instrumentation import span, traced
+from multi_search import MergedSearch, date_range, search_targets
+from prefetcher import LOCATIONS
+from schedule_store import ScheduleStore
+from tk_tasks import TkTaskRunner
+from virtual_table import VirtualTable
+
+SCHEDULE_COLUMNS = ("Index", "Title", "Duration", "Showtimes", "Status")
+MULTI_SEARCH_COLUMNS = ("When", "Location", "Title", "Duration")
+FIND_FILM_RESULTS = 20
 
 class MainWindow(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Movie Maestro")
-        self.geometry("400x300")
+        self.geometry("400x600")
         self.configure(bg="#f2f2f2")
-
-        # Load configuration
-        config_file_path = "config.json"
-        encryption_key_path = "key.key"
-
-        encryption_key = load_encryption_key(encryption_key_path)
-        if not encryption_key:
-            messagebox.showerror("Error", "Failed to load encryption key.")
-            self.destroy()
-            return
-
-        encrypted_config = load_config(config_file_path)
-        if not encrypted_config:
-            messagebox.showerror("Error", "Failed to load config file.")
-            self.destroy()
-            return
-
-        decrypted_config = decrypt_config(encrypted_config, encryption_key)
-        if not decrypted_config:
-            messagebox.showerror("Error", "Failed to decrypt config.")
-            self.destroy()
-            return
-
-        self.api_client = APIClient(decrypted_config)
+        # Created by start_services() once the window is up; until then the
+        # controls that need them stay disabled
+        self.api_client = None
+        self.tasks = None
+        self.prefetcher = None
+        self.schedule_store = None
+        self.booking_pipeline = None
+        self.email_outbox = None
 
         # Location Selection
         location_label = tk.Label(self, text="Select Location:", font=("Arial", 14), bg="#f2f2f2")
@@ -40,7 +43,7 @@ class MainWindow(tk.Tk):
 
         location_var = tk.StringVar()
         location_dropdown = ttk.Combobox(self, textvariable=location_var, state="readonly", font=("Arial", 12))
-        location_dropdown["values"] = ("Location 1", "Location 2", "Location 3")  # Replace with actual values
+        location_dropdown["values"] = LOCATIONS
         location_dropdown.current(0)
         location_dropdown.pack(pady=10)
 
@@ -59,70 +62,355 @@ class MainWindow(tk.Tk):
                 messagebox.showerror("Error", "Invalid date format.")
                 return
 
-            schedules = self.api_client.get_movie_schedules(location, date)
+            # Sold-out lookups still running for the previous search are dropped with it
+            self.cancel_availability_tasks()
+            availability_tasks = self.availability_tasks = []
+            table = table_window = None
+            row_count = 0
+            fanout_left = AVAILABILITY_MAX_FANOUT
+            found_schedules = []
 
-            if not schedules:
-                messagebox.showinfo("Movie Schedules", "No schedules available.")
-                return
+            def stop_search(event):
+                # Closing the window stops the rest of the stream and its lookups
+                if event.widget is table_window:
+                    self.tasks.cancel_task(search_task)
+                    self.cancel_availability_tasks(availability_tasks)
+
+            def show_batch(batch):
+                nonlocal table, table_window, row_count, fanout_left
+                schedules, movie_details_list = batch
+                found_schedules.extend(schedules)
+                if table is None:
+                    table_window, table = self.open_schedules_table()
+                    table_window.bind("<Destroy>", stop_search)
+                start, shown = self.insert_schedule_rows(table, row_count, schedules, movie_details_list)
+                row_count += len(schedules)
+                # The per-showtime fallback shares one cap across the whole search
+                task = self.annotate_sold_out(table, start, shown, fanout_left)
+                if task is not None:
+                    availability_tasks.append(task)
+                    fanout_left -= min(fanout_left, sum(len(schedule.showtimes) for schedule in shown))
+
+            def finish_search(_):
+                self.schedule_store.add_schedules(location, date, found_schedules)
+                if row_count == 0:
+                    messagebox.showinfo("Movie Schedules", "No schedules available.")
 
-            self.display_schedules_table(schedules)
+            # Rows are rendered batch by batch as they arrive; a newer search
+            # supersedes one that is still in flight
+            search_task = self.tasks.submit_stream(self.api_client.iter_schedule_batches, location, date,
+                                                   on_item=show_batch, on_done=finish_search,
+                                                   on_error=self.show_task_error, channel="search")
 
-        search_button = tk.Button(self, text="Search Schedules", command=search_schedules, font=("Arial", 12))
+        search_button = tk.Button(self, text="Search Schedules", command=search_schedules, font=("Arial", 12),
+                                  state="disabled")
         search_button.pack(pady=10)
 
+        multi_search_button = tk.Button(self, text="Search Several Locations and Dates",
+                                        command=self.open_multi_search_dialog, font=("Arial", 12), state="disabled")
+        multi_search_button.pack()
+
         def book_tickets_dialog():
             selection = messagebox.askquestion("Book Tickets", "Do you want to book tickets?")
             if selection == "yes":
                 index = messagebox.askinteger("Select Schedule", "Enter the index of the schedule you want to view:")
                 if index is not None:
-                    schedules = self.api_client.get_movie_schedules(location_var.get(), date_entry.get())
-                    if schedules and 0 <= index < len(schedules):
-                        schedule = schedules[index]
-                        self.display_movie_schedule(schedule)
-                        movie_id = schedule["movie_id"]
-                        showtime = messagebox.askstring("Select Showtime", "Enter the desired showtime:")
-                        seats = messagebox.askinteger("Enter Seats", "Enter the number of seats to book:")
-                        if showtime and seats is not None:
-                            self.book_tickets(movie_id, showtime, seats)
-
-        book_tickets_button = tk.Button(self, text="Book Tickets", command=book_tickets_dialog, font=("Arial", 12))
+                    location = location_var.get()
+                    date = date_entry.get()
+
+                    def fetch_details(schedule):
+                        return schedule, self.api_client.get_movie_details(schedule.movie_id)
+
+                    def select_schedule(schedules):
+                        if schedules:
+                            self.schedule_store.add_schedules(location, date, schedules)
+                        schedule = self.schedule_store.get_schedule(location, date, index)
+                        if schedule is not None:
+                            self.tasks.submit(fetch_details, schedule, on_success=choose_showtime,
+                                              on_error=self.show_task_error, channel="book")
+
+                    # A search already shown is picked from the store instead of re-fetched
+                    if self.schedule_store.has_schedules(location, date):
+                        select_schedule(None)
+                    else:
+                        self.tasks.submit(self.api_client.get_movie_schedules, location, date, on_success=select_schedule,
+                                          on_error=self.show_task_error, channel="book")
+
+        def choose_showtime(result):
+            schedule, movie_details = result
+            if schedule:
+                self.display_movie_schedule(schedule, movie_details)
+                movie_id = schedule.movie_id
+                seats = messagebox.askinteger("Enter Seats", "Enter the number of seats to book:")
+                if seats is None:
+                    return
+                # Availability of every listed showtime is checked while the user picks one
+                if seats > 0:
+                    self.booking_pipeline.prefetch_availability(movie_id, schedule.showtimes, seats)
+                showtime = messagebox.askstring("Select Showtime", "Enter the desired showtime:")
+                if showtime:
+                    self.book_tickets(movie_id, showtime, seats)
+
+        book_tickets_button = tk.Button(self, text="Book Tickets", command=book_tickets_dialog, font=("Arial", 12),
+                                        state="disabled")
         book_tickets_button.pack(pady=10)
 
-    def display_schedules_table(self, schedules):
+        # Find Film: searches the titles and synopses loaded so far as the user types
+        find_film_label = tk.Label(self, text="Find Film:", font=("Arial", 14), bg="#f2f2f2")
+        find_film_label.pack()
+
+        find_film_var = tk.StringVar()
+        find_film_entry = tk.Entry(self, textvariable=find_film_var, font=("Arial", 12), state="disabled")
+        find_film_entry.pack(pady=5)
+        find_film_results = tk.Listbox(self, height=6, font=("Arial", 11))
+        find_film_results.pack(fill="x", padx=20)
+        found_films = []
+
+        def find_films(*_):
+            hits = self.api_client.search_movies(find_film_var.get(), FIND_FILM_RESULTS)
+            found_films[:] = hits
+            find_film_results.delete(0, "end")
+            for hit in hits:
+                find_film_results.insert("end", hit.title)
+
+        def show_found_film(_):
+            selection = find_film_results.curselection()
+            if not selection:
+                return
+            movie_details = self.api_client.search_index.get(found_films[selection[0]].movie_id)
+            if movie_details:
+                messagebox.showinfo("Movie", f"Title: {movie_details.title}\nDuration: {movie_details.duration} minutes\n"
+                                             f"Synopsis: {movie_details.synopsis}")
+
+        find_film_var.trace_add("write", find_films)
+        find_film_results.bind("<Double-Button-1>", show_found_film)
+        find_film_results.bind("<Return>", show_found_film)
+
+        # Sold-out lookups of the current single search
+        self.availability_tasks = []
+        # Idempotency keys of the bookings still running
+        self.booking_keys = {}
+
+        self.service_widgets = [search_button, multi_search_button, book_tickets_button, find_film_entry]
+
+        self.status_label = tk.Label(self, text="", font=("Arial", 10), bg="#f2f2f2")
+        self.status_label.pack()
+        self.progress_bar = ttk.Progressbar(self, mode="indeterminate", length=200)
+
+    def start_services(self):
+        # Runs once the window has been painted: decrypting the config and
+        # loading the HTTP stack are the slow part of startup.
+        from api_client import APIClient
+
+        # Load configuration
+        config_file_path = "config.json"
+        encryption_key_path = "key.key"
+
+        # Key and decrypted config stay in memory and reload only when the files change
+        config_service = get_config_service(config_file_path, encryption_key_path)
+
+        encryption_key = config_service.get_key()
+        if not encryption_key:
+            messagebox.showerror("Error", "Failed to load encryption key.")
+            self.destroy()
+            return False
+
+        if not os.path.exists(config_file_path):
+            messagebox.showerror("Error", "Failed to load config file.")
+            self.destroy()
+            return False
+
+        decrypted_config = config_service.get_config()
+        if not decrypted_config:
+            messagebox.showerror("Error", "Failed to decrypt config.")
+            self.destroy()
+            return False
+
+        # Responses persist across restarts so the last catalogue shows
+        # instantly; each backend keeps its own, so switching profiles never
+        # shows another backend's data
+        profile = profile_from_config(decrypted_config)
+        backing = open_disk_cache(RESPONSE_CACHE_FILE, namespace=profile.cache_namespace)
+        response_cache = ResponseCache(backing=backing)
+        self.attach_client(APIClient.from_config(decrypted_config, cache=response_cache))
+        return True
+
+    def attach_client(self, api_client, email_outbox_path=EMAIL_OUTBOX_FILE):
+        # Starts everything that needs the client and enables the controls.
+        self.api_client = api_client
+        # Upcoming dates are fetched ahead of the user, pausing while a search runs
+        from prefetcher import Prefetcher
+        self.prefetcher = Prefetcher(self.api_client)
+        self.tasks = TkTaskRunner(self, on_busy_changed=self.set_busy)
+        self.schedule_store = ScheduleStore()
+        self.booking_pipeline = BookingPipeline(self.api_client)
+        # Confirmation emails are queued durably and sent in the background
+        self.email_outbox = EmailOutbox(email_outbox_path, self.api_client.send_booking_confirmation_email)
+        self.email_outbox.start()
+        self.prefetcher.start()
+        # Movies from earlier sessions become searchable without a refetch
+        threading.Thread(target=self.api_client.index_cached_details, name="search-index", daemon=True).start()
+        for widget in self.service_widgets:
+            widget.config(state="normal")
+
+    def set_busy(self, busy):
+        self.prefetcher.set_foreground_busy(busy)
+        if busy:
+            self.status_label.config(text="Loading...")
+            self.progress_bar.pack(pady=5)
+            self.progress_bar.start(15)
+        else:
+            self.status_label.config(text="")
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+
+    def open_multi_search_dialog(self):
+        dialog = tk.Toplevel(self)
+        dialog.title("Search Several")
+        dialog.configure(bg="#f2f2f2")
+
+        tk.Label(dialog, text="Locations:", font=("Arial", 12), bg="#f2f2f2").pack(pady=(10, 0))
+        locations_list = tk.Listbox(dialog, selectmode="multiple", height=len(LOCATIONS), exportselection=False)
+        for location in LOCATIONS:
+            locations_list.insert("end", location)
+        locations_list.select_set(0, "end")
+        locations_list.pack(padx=10, pady=5)
+
+        tk.Label(dialog, text="From (YYYY-MM-DD):", font=("Arial", 12), bg="#f2f2f2").pack()
+        first_date_entry = tk.Entry(dialog, font=("Arial", 12))
+        first_date_entry.pack(pady=5)
+        tk.Label(dialog, text="To (YYYY-MM-DD):", font=("Arial", 12), bg="#f2f2f2").pack()
+        last_date_entry = tk.Entry(dialog, font=("Arial", 12))
+        last_date_entry.pack(pady=5)
+
+        def search():
+            locations = [LOCATIONS[index] for index in locations_list.curselection()]
+            if not locations:
+                messagebox.showerror("Error", "Select at least one location.", parent=dialog)
+                return
+            try:
+                dates = date_range(first_date_entry.get(), last_date_entry.get() or first_date_entry.get())
+            except ValueError as e:
+                messagebox.showerror("Error", f"Invalid date range: {e}", parent=dialog)
+                return
+            dialog.destroy()
+            self.search_many(locations, dates)
+
+        tk.Button(dialog, text="Search", command=search, font=("Arial", 12)).pack(pady=10)
+
+    def search_many(self, locations, dates):
+        # Every location/date pair is searched concurrently; each one's
+        # showings join the table as soon as it completes, ordered by time.
+        targets = search_targets(locations, dates)
+        merged = MergedSearch(targets)
+        table_window, table = self.open_schedules_table(MULTI_SEARCH_COLUMNS)
+        table.sort_by("When")
+        table_window.title(f"Movie Schedules (0 of {len(targets)} searches)")
+
+        def show_result(result):
+            table.append_rows(merged.add(*result))
+            table_window.title(f"Movie Schedules ({merged.completed} of {len(targets)} searches)")
+
+        def finish_search(_):
+            if not table_window.winfo_exists():
+                return
+            if merged.failed:
+                failed = ", ".join(f"{location} on {date}" for location, date in merged.failed)
+                messagebox.showerror("Error", f"Some searches failed: {failed}", parent=table_window)
+            elif not table.rows:
+                messagebox.showinfo("Movie Schedules", "No schedules available.", parent=table_window)
+
+        # No channel: a single search started meanwhile must not cancel this
+        # one and leave its window part-filled
+        search_task = self.tasks.submit_stream(self.api_client.search_schedules_many, locations, dates,
+                                               on_item=show_result, on_done=finish_search,
+                                               on_error=self.show_task_error)
+        # Closing the window stops the searches that have not started
+        table_window.bind("<Destroy>", lambda event: self.tasks.cancel_task(search_task)
+                          if event.widget is table_window else None)
+
+    def show_task_error(self, error):
+        messagebox.showerror("Error", f"Request failed: {error}")
+
+    def open_schedules_table(self, columns=SCHEDULE_COLUMNS):
         table_window = tk.Toplevel(self)
         table_window.title("Movie Schedules")
         table_window.geometry("600x400")
 
-        if not schedules:
-            no_schedules_label = tk.Label(table_window, text="No schedules available.", font=("Arial", 14))
-            no_schedules_label.pack(pady=50)
-            return
+        # Filter bar: narrows the table by the chosen column without rebuilding it
+        filter_frame = tk.Frame(table_window)
+        filter_frame.pack(fill="x", padx=10, pady=(10, 0))
+        tk.Label(filter_frame, text="Filter:").pack(side="left")
+        filter_column_var = tk.StringVar(value="Title")
+        filter_column_dropdown = ttk.Combobox(filter_frame, textvariable=filter_column_var, state="readonly", width=10)
+        filter_column_dropdown["values"] = [column for column in columns if column != "Index"]
+        filter_column_dropdown.pack(side="left", padx=5)
+        filter_var = tk.StringVar()
+        filter_entry = tk.Entry(filter_frame, textvariable=filter_var)
+        filter_entry.pack(side="left", fill="x", expand=True)
 
-        table = ttk.Treeview(table_window, columns=("Index", "Title", "Duration", "Showtimes"), show="headings")
-        table.heading("Index", text="Index")
-        table.heading("Title", text="Title")
-        table.heading("Duration", text="Duration")
-        table.heading("Showtimes", text="Showtimes")
+        table = VirtualTable(table_window, columns=columns)
+        table.pack(fill="both", expand=True, padx=10, pady=10)
 
-        for index, schedule in enumerate(schedules):
-            movie_id = schedule["movie_id"]
-            movie_details = self.api_client.get_movie_details(movie_id)
+        def apply_filter(*_):
+            table.filters.clear()
+            table.set_filter(filter_column_var.get(), filter_var.get())
+
+        filter_var.trace_add("write", apply_filter)
+        filter_column_dropdown.bind("<<ComboboxSelected>>", apply_filter)
+
+        return table_window, table
+
+    @traced()
+    def insert_schedule_rows(self, table, start_index, schedules, movie_details_list):
+        rows = []
+        shown = []
+        for index, (schedule, movie_details) in enumerate(zip(schedules, movie_details_list), start_index):
             if movie_details:
-                title = movie_details["title"]
-                duration = movie_details["duration"]
-                showtimes = ", ".join(schedule["showtimes"])
-                table.insert("", "end", values=(index, title, duration, showtimes))
+                title = movie_details.title
+                duration = movie_details.duration
+                showtimes = ", ".join(schedule.showtimes)
+                rows.append((index, title, duration, showtimes, ""))
+                shown.append(schedule)
+        with span("VirtualTable.append_rows", rows=len(rows)):
+            start = table.append_rows(rows)
+        return start, shown
 
-        table.pack(pady=10)
+    def annotate_sold_out(self, table, start, schedules, max_fanout=AVAILABILITY_MAX_FANOUT):
+        # Sold-out showtimes are looked up for the whole batch at once and
+        # filled into the Status column when the answers arrive. Returns the
+        # lookup task, or None when there is nothing to look up.
+        queries = [(schedule.movie_id, showtime, 1) for schedule in schedules for showtime in schedule.showtimes]
+        if not queries or (max_fanout <= 0 and not self.api_client.bulk_availability):
+            return None
+
+        def show_status(results):
+            if not table.winfo_exists():
+                return
+            updates = []
+            for position, schedule in enumerate(schedules, start):
+                status = sold_out_status(schedule.movie_id, schedule.showtimes, results)
+                if status:
+                    updates.append((position, "Status", status))
+            table.update_cells(updates)
 
-    def display_movie_schedule(self, schedule):
-        movie_id = schedule["movie_id"]
-        movie_details = self.api_client.get_movie_details(movie_id)
+        return self.tasks.submit(self.api_client.check_seat_availability_many, queries, DEFAULT_MAX_WORKERS,
+                                 max_fanout, on_success=show_status)
+
+    def cancel_availability_tasks(self, tasks=None):
+        tasks = self.availability_tasks if tasks is None else tasks
+        for task in tasks:
+            self.tasks.cancel_task(task)
+        tasks.clear()
+
+    def display_movie_schedule(self, schedule, movie_details=None):
+        # Details are fetched by the caller's background task; refetching here
+        # would block the Tk thread, so a failed lookup is only reported.
         if movie_details:
-            title = movie_details["title"]
-            duration = movie_details["duration"]
-            synopsis = movie_details["synopsis"]
-            showtimes = schedule["showtimes"]
+            title = movie_details.title
+            duration = movie_details.duration
+            synopsis = movie_details.synopsis
+            showtimes = schedule.showtimes
 
             messagebox.showinfo("Movie Schedule", f"Title: {title}\nDuration: {duration} minutes\nSynopsis: {synopsis}\nShowtimes: {', '.join(showtimes)}")
         else:
@@ -130,21 +418,34 @@ class MainWindow(tk.Tk):
 
     def book_tickets(self, movie_id, showtime, seats):
         if self.api_client.validate_seats(seats):
-            if not self.api_client.check_seat_availability(movie_id, showtime, seats):
-                messagebox.showinfo("Booking Failed", "Seats not available.")
-                return
+            # A booking repeated while the first is still running (a double
+            # click) shares its idempotency key, so the ticketing system and
+            # the email outbox both drop the repeat
+            booking = (movie_id, showtime, seats)
+            idempotency_key = self.booking_keys.setdefault(booking, uuid.uuid4().hex)
+
+            def show_booking_result(status):
+                self.booking_keys.pop(booking, None)
+                if status == "unavailable":
+                    messagebox.showinfo("Booking Failed", "Seats not available.")
+                elif status == "booked":
+                    self.email_outbox.enqueue(movie_id, showtime, seats, dedupe_key=idempotency_key)
+                    messagebox.showinfo("Booking Successful", "Tickets booked successfully!")
+                else:
+                    messagebox.showinfo("Booking Failed", "Booking failed. Please try again later.")
 
-            booking_successful = self.api_client.make_ticket_booking(movie_id, showtime, seats)
+            def show_booking_error(error):
+                self.booking_keys.pop(booking, None)
+                self.show_task_error(error)
 
-            if booking_successful:
-                messagebox.showinfo("Booking Successful", "Tickets booked successfully!")
-                self.api_client.send_booking_confirmation_email(movie_id, showtime, seats)
-            else:
-                messagebox.showinfo("Booking Failed", "Booking failed. Please try again later.")
+            self.tasks.submit(self.booking_pipeline.book, movie_id, showtime, seats, idempotency_key,
+                              on_success=show_booking_result, on_error=show_booking_error)
         else:
             messagebox.showinfo("Invalid Seats", "Invalid number of seats.")
 
 
 if __name__ == "__main__":
     app = MainWindow()
-    app.mainloop()
+    app.update()
+    if app.start_services():
+        app.mainloop()
@@ -1,29 +1,59 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import requests
-import re
 import os
-import prettytable
 import json
 import logging
-from cryptography.fernet import Fernet
+import uuid
+from startup import lazy_module, startup_timer
+from availability import sold_out_status, AVAILABILITY_MAX_FANOUT
+from backend_profiles import profile_from_config
+from booking_pipeline import BookingPipeline
+from cache import ResponseCache
+from concurrency import DEFAULT_MAX_WORKERS
+from config_service import get_config_service, get_fernet
+from disk_cache import open_disk_cache, RESPONSE_CACHE_FILE
+from email_outbox import EmailOutbox, EMAIL_OUTBOX_FILE
+from instrumentation import span
+from prefetcher import LOCATIONS
+from schedule_store import ScheduleStore
+from tk_tasks import TkTaskRunner
 
 CONFIG_FILE = "config.json"
 ENCRYPTED_CONFIG_FILE = "encrypted_config.json"
 KEY_FILE = "key.key"
+# The movie database, ticketing system and email service each on their own
+# host unless the config names another backend profile
+DEFAULT_BACKEND_PROFILE = "services"
+
+# Only needed once a table is shown; importing it up front would delay the
+# first window
+prettytable = lazy_module("prettytable")
 
 class MovieScheduleBot:
-    def __init__(self):
-        self.api_key = None
-        self.auth_token = None
-        self.email_auth_token = None
+    def __init__(self, response_cache_path=RESPONSE_CACHE_FILE, email_outbox_path=EMAIL_OUTBOX_FILE):
+        self.config = {}
         self.fernet_key = None
+        self.config_service = get_config_service(ENCRYPTED_CONFIG_FILE, KEY_FILE)
+        self.response_cache_path = response_cache_path
+        self.email_outbox_path = email_outbox_path
+        # The response cache, API client, booking pipeline and email outbox
+        # are created by connect(), after the window is up
+        self.cache = None
+        self.client = None
+        self.booking_pipeline = None
+        self.email_outbox = None
+        self.tasks = None
+        self.prefetcher = None
+        self.schedule_store = ScheduleStore()
+        # Idempotency keys of the bookings still running
+        self.booking_keys = {}
 
     def generate_default_config(self):
         config = {
             "MOVIE_API_KEY": "YOUR_MOVIE_API_KEY",
             "TICKETING_SYSTEM_AUTH_TOKEN": "YOUR_TICKETING_SYSTEM_AUTH_TOKEN",
-            "EMAIL_SERVICE_AUTH_TOKEN": "YOUR_EMAIL_SERVICE_AUTH_TOKEN"
+            "EMAIL_SERVICE_AUTH_TOKEN": "YOUR_EMAIL_SERVICE_AUTH_TOKEN",
+            "COMBINED_BOOKING": False
         }
 
         with open(CONFIG_FILE, "w") as f:
@@ -33,203 +63,166 @@ class MovieScheduleBot:
         with open(CONFIG_FILE, "r") as f:
             config = json.load(f)
 
-        fernet = Fernet(self.fernet_key)
-        encrypted_config = fernet.encrypt(json.dumps(config).encode())
+        encrypted_config = get_fernet(self.fernet_key).encrypt(json.dumps(config).encode())
 
         with open(ENCRYPTED_CONFIG_FILE, "wb") as f:
             f.write(encrypted_config)
 
     def decrypt_config(self):
-        with open(ENCRYPTED_CONFIG_FILE, "rb") as f:
-            encrypted_config = f.read()
-
-        fernet = Fernet(self.fernet_key)
-        decrypted_config = fernet.decrypt(encrypted_config).decode()
-
-        return json.loads(decrypted_config)
+        # The config service decrypts once and reloads only when a file changes
+        return self.config_service.get_config()
 
     def load_config(self):
-        try:
-            with open(KEY_FILE, "rb") as f:
-                self.fernet_key = f.read()
+        self.fernet_key = self.config_service.get_key()
+        if self.fernet_key is None:
+            logging.error("Failed to load configuration file.")
+            return
 
+        try:
             if not os.path.exists(ENCRYPTED_CONFIG_FILE):
                 self.generate_default_config()
                 self.encrypt_config()
             else:
                 config = self.decrypt_config()
-                self.api_key = config.get("MOVIE_API_KEY")
-                self.auth_token = config.get("TICKETING_SYSTEM_AUTH_TOKEN")
-                self.email_auth_token = config.get("EMAIL_SERVICE_AUTH_TOKEN")
+                if config is None:
+                    logging.error("Failed to load configuration file.")
+                    return
+                self.config = config
 
         except (FileNotFoundError, json.JSONDecodeError):
             logging.error("Failed to load configuration file.")
 
-    def check_seat_availability(self, movie_id, showtime, seats):
-        # Check seat availability using an external ticketing system API
-        url = "https://api.ticketing-system.com/seats/check_availability"
-        payload = {
-            "movie_id": movie_id,
-            "showtime": showtime,
-            "seats": seats
-        }
-        headers = {
-            "Authorization": f"Bearer {self.auth_token}",
-            "Content-Type": "application/json"
-        }
-
-        try:
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()  # Raise exception for non-2xx status codes
-            availability = response.json().get("availability")
-            return availability
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error occurred while checking seat availability: {e}")
-            return False
-
-    def make_ticket_booking(self, movie_id, showtime, seats):
-        # Make ticket booking using an external ticketing system API
-        url = "https://api.ticketing-system.com/bookings"
-        payload = {
-            "movie_id": movie_id,
-            "showtime": showtime,
-            "seats": seats,
-            "customer_id": "CUSTOMER_ID"
-        }
-        headers = {
-            "Authorization": f"Bearer {self.auth_token}",
-            "Content-Type": "application/json"
-        }
-
-        try:
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()  # Raise exception for non-2xx status codes
-            booking_status = response.json().get("status")
-            return booking_status == "success"
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error occurred while making ticket booking: {e}")
-            return False
-
-    def send_booking_confirmation_email(self, movie_id, showtime, seats):
-        # Send booking confirmation email using an email sending service
-        email_service_url = "https://api.email-service.com/send"
-        payload = {
-            "to": "customer@example.com",
-            "subject": "Booking Confirmation",
-            "body": f"Thank you for booking tickets!\n\nMovie ID: {movie_id}\nShowtime: {showtime}\nSeats: {seats}"
-        }
-        headers = {
-            "Authorization": f"Bearer {self.email_auth_token}",
-            "Content-Type": "application/json"
-        }
-
-        try:
-            response = requests.post(email_service_url, json=payload, headers=headers)
-            response.raise_for_status()  # Raise exception for non-2xx status codes
-            return True
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error occurred while sending booking confirmation email: {e}")
-            return False
-
-    def validate_date(self, date):
-        pattern = r"^\d{4}-\d{2}-\d{2}$"
-        return re.match(pattern, date)
-
-    def validate_seats(self, seats):
-        try:
-            seats = int(seats)
-            return seats > 0
-        except ValueError:
-            return False
-
-    def get_movie_schedules(self, location, date):
-        try:
-            url = f"https://api.movies.com/schedules?location={location}&date={date}&api_key={self.api_key}"
-            response = requests.get(url)
-            response.raise_for_status()  # Raise exception for non-2xx status codes
-            schedules = response.json()
-            return schedules
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error occurred while retrieving schedules: {e}")
-            return None
-
-    def get_movie_details(self, movie_id):
-        try:
-            url = f"https://api.movies.com/movies/{movie_id}?api_key={self.api_key}"
-            response = requests.get(url)
-            response.raise_for_status()  # Raise exception for non-2xx status codes
-            movie_details = response.json()
-            return movie_details
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error occurred while retrieving movie details: {e}")
-            return None
-
-    def display_movie_schedule(self, schedule):
-        movie_id = schedule["movie_id"]
-        movie_details = self.get_movie_details(movie_id)
+    def connect(self):
+        # The HTTP stack is loaded here, after the window is up. The client
+        # brings the pooled transport, caching, request coalescing, delta
+        # sync and tracing the other windows use.
+        from api_client import APIClient
+        # Opening the disk cache may compact it, so it waits until the window
+        # is painted too. Persisted responses are kept apart per backend, so
+        # switching profiles never shows another backend's data
+        backing = None
+        if self.response_cache_path:
+            namespace = profile_from_config(self.config, DEFAULT_BACKEND_PROFILE).cache_namespace
+            backing = open_disk_cache(self.response_cache_path, namespace=namespace)
+        self.cache = ResponseCache(backing=backing)
+        self.client = APIClient.from_config(self.config, default_profile=DEFAULT_BACKEND_PROFILE, cache=self.cache)
+        self.booking_pipeline = BookingPipeline(self.client)
+        self.email_outbox = EmailOutbox(self.email_outbox_path, self.client.send_booking_confirmation_email)
+        self.email_outbox.start()
+
+    def display_movie_schedule(self, schedule, movie_details=None):
+        # Details are fetched by the caller's background task; refetching here
+        # would block the Tk thread, so a failed lookup is only reported.
         if movie_details:
-            title = movie_details["title"]
-            duration = movie_details["duration"]
-            synopsis = movie_details["synopsis"]
-            showtimes = schedule["showtimes"]
+            title = movie_details.title
+            duration = movie_details.duration
+            synopsis = movie_details.synopsis
+            showtimes = schedule.showtimes
 
             messagebox.showinfo("Movie Schedule", f"Title: {title}\nDuration: {duration} minutes\nSynopsis: {synopsis}\nShowtimes: {', '.join(showtimes)}")
         else:
             messagebox.showerror("Error", "Failed to retrieve movie details.")
 
-    def display_schedules_table(self, schedules):
+    def display_schedules_table(self, schedules, movie_details_list=None, availability=None):
+        # Returns the text widget showing the table, so the Status column can
+        # be filled in once availability arrives
         if not schedules:
             messagebox.showinfo("Movie Schedules", "No schedules available.")
-            return
-
-        table = prettytable.PrettyTable()
-        table.field_names = ["Index", "Title", "Duration", "Showtimes"]
-
-        for index, schedule in enumerate(schedules):
-            movie_id = schedule["movie_id"]
-            movie_details = self.get_movie_details(movie_id)
-            if movie_details:
-                title = movie_details["title"]
-                duration = movie_details["duration"]
-                showtimes = ", ".join(schedule["showtimes"])
-                table.add_row([index, title, duration, showtimes])
+            return None
 
-        messagebox.showinfo("Movie Schedules", table)
+        if movie_details_list is None:
+            movie_ids = [schedule.movie_id for schedule in schedules]
+            movie_details_list = self.client.get_movie_details_many(movie_ids)
+
+        table_window = tk.Toplevel()
+        table_window.title("Movie Schedules")
+        table_text = tk.Text(table_window, font="TkFixedFont", wrap="none")
+        table_text.pack(fill="both", expand=True)
+        self.update_schedules_table(table_text, schedules, movie_details_list, availability)
+        return table_text
+
+    def update_schedules_table(self, table_text, schedules, movie_details_list, availability=None):
+        with span("MovieScheduleBot.display_schedules_table", schedules=len(schedules)):
+            table = prettytable.PrettyTable()
+            table.field_names = ["Index", "Title", "Duration", "Showtimes", "Status"]
+
+            for index, (schedule, movie_details) in enumerate(zip(schedules, movie_details_list)):
+                if movie_details:
+                    title = movie_details.title
+                    duration = movie_details.duration
+                    showtimes = ", ".join(schedule.showtimes)
+                    status = sold_out_status(schedule.movie_id, schedule.showtimes, availability or {})
+                    table.add_row([index, title, duration, showtimes, status])
+            rendered = table.get_string()
+
+        table_text.config(state="normal")
+        table_text.delete("1.0", "end")
+        table_text.insert("1.0", rendered)
+        table_text.config(state="disabled")
 
     def book_tickets(self, movie_id, showtime, seats):
-        if self.validate_seats(seats):
-            if not self.check_seat_availability(movie_id, showtime, seats):
-                messagebox.showinfo("Booking Failed", "Seats not available.")
-                return
-
-            booking_successful = self.make_ticket_booking(movie_id, showtime, seats)
-
-            if booking_successful:
-                messagebox.showinfo("Booking Successful", "Tickets booked successfully!")
-                self.send_booking_confirmation_email(movie_id, showtime, seats)
-            else:
-                messagebox.showinfo("Booking Failed", "Booking failed. Please try again later.")
+        if self.client.validate_seats(seats):
+            # A booking repeated while the first is still running (a double
+            # click) shares its idempotency key, so the ticketing system and
+            # the email outbox both drop the repeat
+            booking = (movie_id, showtime, seats)
+            idempotency_key = self.booking_keys.setdefault(booking, uuid.uuid4().hex)
+
+            def show_booking_result(status):
+                self.booking_keys.pop(booking, None)
+                if status == "unavailable":
+                    messagebox.showinfo("Booking Failed", "Seats not available.")
+                elif status == "booked":
+                    self.email_outbox.enqueue(movie_id, showtime, seats, dedupe_key=idempotency_key)
+                    messagebox.showinfo("Booking Successful", "Tickets booked successfully!")
+                else:
+                    messagebox.showinfo("Booking Failed", "Booking failed. Please try again later.")
+
+            def show_booking_error(error):
+                self.booking_keys.pop(booking, None)
+                self.show_task_error(error)
+
+            self.tasks.submit(self.booking_pipeline.book, movie_id, showtime, seats, idempotency_key,
+                              on_success=show_booking_result, on_error=show_booking_error)
         else:
             messagebox.showinfo("Invalid Seats", "Invalid number of seats.")
 
-    def main(self):
+    def show_task_error(self, error):
+        messagebox.showerror("Error", f"Request failed: {error}")
+
+    def main(self, exit_when_ready=False):
         if not os.path.exists(CONFIG_FILE):
             self.generate_default_config()
 
-        self.load_config()
-
         logging.basicConfig(level=logging.INFO)
 
         root = tk.Tk()
         root.title("Movie Schedule Bot")
 
+        status_label = tk.Label(root, text="")
+        progress_bar = ttk.Progressbar(root, mode="indeterminate", length=200)
+
+        def set_busy(busy):
+            if self.prefetcher is not None:
+                self.prefetcher.set_foreground_busy(busy)
+            if busy:
+                status_label.config(text="Loading...")
+                progress_bar.grid(row=5, column=0, columnspan=2, padx=10, pady=(0, 10))
+                progress_bar.start(15)
+            else:
+                status_label.config(text="")
+                progress_bar.stop()
+                progress_bar.grid_remove()
+
+        self.tasks = TkTaskRunner(root, on_busy_changed=set_busy)
+
         # Location Selection
         location_label = tk.Label(root, text="Select location:")
         location_label.grid(row=0, column=0, padx=10, pady=10)
 
         location_var = tk.StringVar()
         location_dropdown = ttk.Combobox(root, textvariable=location_var, state="readonly")
-        location_dropdown["values"] = ("Location 1", "Location 2", "Location 3")  # Update with actual values
+        location_dropdown["values"] = LOCATIONS
         location_dropdown.current(0)
         location_dropdown.grid(row=0, column=1, padx=10, pady=10)
 
@@ -244,19 +237,47 @@ class MovieScheduleBot:
             location = location_var.get()
             date = date_entry.get()
 
-            if not self.validate_date(date):
+            if not self.client.validate_date(date):
                 messagebox.showerror("Error", "Invalid date format.")
                 return
 
-            schedules = self.get_movie_schedules(location, date)
-
-            if not schedules:
-                messagebox.showerror("Error", "Failed to retrieve schedules.")
-                return
-
-            self.display_schedules_table(schedules)
-
-        search_button = tk.Button(root, text="Search Schedules", command=search_schedules)
+            def fetch_schedules():
+                # The prettytable is rendered as a whole, so the streamed
+                # batches are collected before rendering
+                schedules = []
+                movie_details_list = []
+                for batch_schedules, batch_details in self.client.iter_schedule_batches(location, date):
+                    schedules.extend(batch_schedules)
+                    movie_details_list.extend(batch_details)
+                return schedules, movie_details_list
+
+            def show_schedules(result):
+                schedules, movie_details_list = result
+                if not schedules:
+                    messagebox.showerror("Error", "Failed to retrieve schedules.")
+                    return
+                self.schedule_store.add_schedules(location, date, schedules)
+                table_text = self.display_schedules_table(schedules, movie_details_list)
+
+                # The table is shown right away; sold-out showtimes are filled
+                # into the Status column when the answers arrive
+                def show_status(availability):
+                    if table_text.winfo_exists():
+                        self.update_schedules_table(table_text, schedules, movie_details_list, availability)
+
+                queries = [(schedule.movie_id, showtime, 1) for schedule in schedules
+                           for showtime in schedule.showtimes]
+                availability_task = self.tasks.submit(self.client.check_seat_availability_many, queries,
+                                                      DEFAULT_MAX_WORKERS, AVAILABILITY_MAX_FANOUT,
+                                                      on_success=show_status, channel="availability")
+                table_text.bind("<Destroy>", lambda event: self.tasks.cancel_task(availability_task))
+
+            # A newer search supersedes one that is still in flight
+            self.tasks.submit(fetch_schedules, on_success=show_schedules, on_error=self.show_task_error,
+                              channel="search")
+
+        # Disabled until connect() has created the client
+        search_button = tk.Button(root, text="Search Schedules", command=search_schedules, state="disabled")
         search_button.grid(row=2, column=0, columnspan=2, padx=10, pady=10)
 
         def book_tickets_dialog():
@@ -264,19 +285,66 @@ class MovieScheduleBot:
             if selection == "yes":
                 index = messagebox.askinteger("Select Schedule", "Enter the index of the schedule you want to view:")
                 if index is not None:
-                    schedules = self.get_movie_schedules(location_var.get(), date_entry.get())
-                    if schedules and 0 <= index < len(schedules):
-                        schedule = schedules[index]
-                        self.display_movie_schedule(schedule)
-                        movie_id = schedule["movie_id"]
-                        showtime = messagebox.askstring("Select Showtime", "Enter the desired showtime:")
-                        seats = messagebox.askinteger("Enter Seats", "Enter the number of seats to book:")
-                        if showtime and seats is not None:
-                            self.book_tickets(movie_id, showtime, seats)
-
-        book_tickets_button = tk.Button(root, text="Book Tickets", command=book_tickets_dialog)
+                    location = location_var.get()
+                    date = date_entry.get()
+
+                    def fetch_details(schedule):
+                        return schedule, self.client.get_movie_details(schedule.movie_id)
+
+                    def select_schedule(schedules):
+                        if schedules:
+                            self.schedule_store.add_schedules(location, date, schedules)
+                        schedule = self.schedule_store.get_schedule(location, date, index)
+                        if schedule is not None:
+                            self.tasks.submit(fetch_details, schedule, on_success=choose_showtime,
+                                              on_error=self.show_task_error, channel="book")
+
+                    # A search already shown is picked from the store instead of re-fetched
+                    if self.schedule_store.has_schedules(location, date):
+                        select_schedule(None)
+                    else:
+                        self.tasks.submit(self.client.get_movie_schedules, location, date, on_success=select_schedule,
+                                          on_error=self.show_task_error, channel="book")
+
+        def choose_showtime(result):
+            schedule, movie_details = result
+            if schedule:
+                self.display_movie_schedule(schedule, movie_details)
+                movie_id = schedule.movie_id
+                seats = messagebox.askinteger("Enter Seats", "Enter the number of seats to book:")
+                if seats is None:
+                    return
+                # Availability of every listed showtime is checked while the user picks one
+                if seats > 0:
+                    self.booking_pipeline.prefetch_availability(movie_id, schedule.showtimes, seats)
+                showtime = messagebox.askstring("Select Showtime", "Enter the desired showtime:")
+                if showtime:
+                    self.book_tickets(movie_id, showtime, seats)
+
+        book_tickets_button = tk.Button(root, text="Book Tickets", command=book_tickets_dialog, state="disabled")
         book_tickets_button.grid(row=3, column=0, columnspan=2, padx=10, pady=10)
 
+        status_label.grid(row=4, column=0, columnspan=2, padx=10)
+
+        # The window is painted before the config is decrypted and the HTTP
+        # stack is loaded, so it appears as soon as Tk is up
+        root.update()
+        startup_timer.mark("first_paint")
+        self.load_config()
+        startup_timer.mark("config_loaded")
+        self.connect()  # Loaded here rather than on the first search
+        search_button.config(state="normal")
+        book_tickets_button.config(state="normal")
+        startup_timer.mark("network_ready")
+
+        # Upcoming dates are fetched ahead of the user, pausing while a search runs
+        from prefetcher import Prefetcher
+        self.prefetcher = Prefetcher(self.client).start()
+
+        if exit_when_ready:
+            print(json.dumps(startup_timer.as_dict()))
+            root.destroy()
+            return
         root.mainloop()
 
 if __name__ == "__main__":
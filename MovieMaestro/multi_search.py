@@ -0,0 +1,92 @@
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from schedule_store import showtime_minutes
+
+DATE_FORMAT = "%Y-%m-%d"
+# Each search also fetches the details of its movies, so a few at a time
+# already keep the connection pool busy.
+DEFAULT_MAX_SEARCHES = 4
+MAX_SEARCH_DAYS = 14
+
+
+def date_range(first_date, last_date, max_days=MAX_SEARCH_DAYS):
+    # Every date from first_date to last_date inclusive, as "YYYY-MM-DD".
+    start = datetime.datetime.strptime(first_date, DATE_FORMAT).date()
+    end = datetime.datetime.strptime(last_date, DATE_FORMAT).date()
+    days = (end - start).days + 1
+    if days < 1:
+        raise ValueError("The last date is before the first date.")
+    if days > max_days:
+        raise ValueError(f"The date range is longer than {max_days} days.")
+    return [(start + datetime.timedelta(days=offset)).strftime(DATE_FORMAT) for offset in range(days)]
+
+
+def search_targets(locations, dates):
+    # Nearest dates first, each at every location; repeats are searched once.
+    return list(dict.fromkeys((location, date) for date in dates for location in locations))
+
+
+def iter_searches(client, targets, max_searches=DEFAULT_MAX_SEARCHES):
+    # Runs the (location, date) searches at most max_searches at a time and
+    # yields (location, date, schedules, movie_details_list) as each one
+    # finishes, so results can be shown before the slowest arrives. A failed
+    # search yields None schedules. Closing the generator drops the searches
+    # that have not started.
+    targets = list(targets)
+    if not targets:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(max_searches, len(targets)), thread_name_prefix="multi-search")
+    try:
+        futures = {executor.submit(_search, client, location, date): (location, date) for location, date in targets}
+        for future in as_completed(futures):
+            location, date = futures[future]
+            try:
+                schedules, movie_details_list = future.result()
+            except Exception as e:
+                logging.error(f"Error occurred while searching schedules for {location} on {date}: {e}")
+                schedules, movie_details_list = None, []
+            yield location, date, schedules, movie_details_list
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _search(client, location, date):
+    schedules = client.get_movie_schedules(location, date)
+    if not schedules:
+        return schedules, []
+    return schedules, client.get_movie_details_many([schedule.movie_id for schedule in schedules])
+
+
+class MergedSearch:
+    # Turns the showings of many searches into table rows, keeping a showing
+    # reported twice (the same location or date asked for twice, or a
+    # repeated showtime) once; the table orders them. Rows are
+    # (when, location, title, duration) tuples.
+    def __init__(self, targets):
+        self.targets = list(targets)
+        self.completed = 0
+        self.failed = []
+        self._seen = set()
+
+    def add(self, location, date, schedules, movie_details_list):
+        # Returns the rows this search added.
+        self.completed += 1
+        if schedules is None:
+            self.failed.append((location, date))
+            return []
+
+        added = []
+        for schedule, movie_details in zip(schedules, movie_details_list):
+            if not movie_details:
+                continue
+            for showtime in schedule.showtimes:
+                key = (location, date, schedule.movie_id, showtime)
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+                minutes = showtime_minutes(showtime)
+                # Zero-padded so the table can sort the column as text
+                when = f"{date} {minutes // 60:02d}:{minutes % 60:02d}" if minutes is not None else f"{date} {showtime}"
+                added.append((when, location, movie_details.title, movie_details.duration))
+        return added
@@ -0,0 +1,119 @@
+import datetime
+import logging
+import threading
+from concurrency import fetch_many
+
+# The locations offered in the search windows.
+LOCATIONS = ("Location 1", "Location 2", "Location 3")  # Replace with actual values
+DEFAULT_DAYS = 3
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_REQUESTS_PER_SECOND = 5.0
+# Schedules stay fresh for five minutes and are served stale for thirty more.
+DEFAULT_REFRESH_INTERVAL = 900.0
+
+
+class Prefetcher:
+    # Warms the client's response cache in the background with the schedules
+    # for today and the next few days at every location, then the details of
+    # the movies they list. It uses a small pool and its own request rate, and
+    # holds back while paused, so a search the user started never queues
+    # behind it.
+    def __init__(self, client, locations=LOCATIONS, days=DEFAULT_DAYS, max_workers=DEFAULT_MAX_WORKERS,
+                 max_requests_per_second=DEFAULT_MAX_REQUESTS_PER_SECOND, refresh_interval=DEFAULT_REFRESH_INTERVAL,
+                 today=datetime.date.today):
+        self.client = client
+        self.locations = tuple(locations)
+        self.days = days
+        self.max_workers = max_workers
+        self.refresh_interval = refresh_interval
+        self.today = today
+        # Imported here: resilience pulls in requests, which the windows load
+        # only after their first paint
+        from resilience import TokenBucket
+        self._bucket = TokenBucket(max_requests_per_second, 1, max_wait=float("inf"))
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._pauses = 0
+        self._pauses_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        self.runs = 0
+        self.schedules_prefetched = 0
+        self.details_prefetched = 0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="prefetcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._resumed.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def pause(self):
+        # Pauses nest; prefetching resumes after the matching number of resumes.
+        with self._pauses_lock:
+            self._pauses += 1
+            self._resumed.clear()
+
+    def resume(self):
+        with self._pauses_lock:
+            self._pauses = max(self._pauses - 1, 0)
+            if self._pauses == 0:
+                self._resumed.set()
+
+    def set_foreground_busy(self, busy):
+        # Fits TkTaskRunner's on_busy_changed callback.
+        if busy:
+            self.pause()
+        else:
+            self.resume()
+
+    def targets(self):
+        first_day = self.today()
+        dates = [(first_day + datetime.timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(self.days)]
+        # Nearest dates first: they are the most likely searches
+        return [(location, date) for date in dates for location in self.locations]
+
+    def prefetch_once(self):
+        schedules_list = fetch_many(self._prefetch_schedules, self.targets(), self.max_workers)
+        movie_ids = [schedule.movie_id for schedules in schedules_list if schedules
+                     for schedule in schedules]
+        details_list = fetch_many(self._prefetch_details, movie_ids, self.max_workers)
+        self.runs += 1
+        self.schedules_prefetched += sum(1 for schedules in schedules_list if schedules)
+        self.details_prefetched += len({movie_id for movie_id, details in zip(movie_ids, details_list) if details})
+
+    def _prefetch_schedules(self, target):
+        if not self._wait_for_turn():
+            return None
+        return self.client.get_movie_schedules(*target)
+
+    def _prefetch_details(self, movie_id):
+        if not self._wait_for_turn():
+            return None
+        return self.client.get_movie_details(movie_id)
+
+    def _wait_for_turn(self):
+        # Blocks while paused and then for a rate-limit token; False once stopping.
+        while not self._stopping.is_set():
+            self._resumed.wait()
+            if self._stopping.is_set():
+                break
+            self._bucket.acquire()
+            if self._resumed.is_set():
+                return not self._stopping.is_set()
+        return False
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.prefetch_once()
+            except Exception as e:
+                logging.error(f"Error occurred while prefetching schedules: {e}")
+            self._stopping.wait(self.refresh_interval)
@@ -0,0 +1,141 @@
+import json
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def _default_json_decoder():
+    # orjson parses large payloads several times faster than the standard
+    # library and takes the raw response bytes without a decode step.
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+    return orjson.loads
+
+
+_json_decoder = _default_json_decoder()
+
+
+def set_json_decoder(loads=None):
+    # Installs loads(bytes_or_str) as the decoder; None restores the default.
+    global _json_decoder
+    _json_decoder = loads or _default_json_decoder()
+
+
+def json_decoder_name():
+    return getattr(_json_decoder, "__module__", None) or repr(_json_decoder)
+
+
+def decode_json(data):
+    return _json_decoder(data)
+
+
+def _require(data, key, types):
+    value = data.get(key)
+    if not isinstance(value, types) or isinstance(value, bool):
+        raise InvalidRecord(f"{key!r} missing or not {types}: {value!r}")
+    return value
+
+
+class Schedule:
+    __slots__ = ("movie_id", "showtimes")
+
+    def __init__(self, movie_id, showtimes):
+        self.movie_id = movie_id
+        self.showtimes = showtimes
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise InvalidRecord(f"schedule is not an object: {data!r}")
+        movie_id = _require(data, "movie_id", (str, int))
+        showtimes = tuple(_require(data, "showtimes", list))
+        for showtime in showtimes:
+            if not isinstance(showtime, str):
+                raise InvalidRecord(f"showtime is not a string: {showtime!r}")
+        return cls(str(movie_id), showtimes)
+
+    def to_dict(self):
+        return {"movie_id": self.movie_id, "showtimes": list(self.showtimes)}
+
+    def __eq__(self, other):
+        if not isinstance(other, Schedule):
+            return NotImplemented
+        return self.movie_id == other.movie_id and self.showtimes == other.showtimes
+
+    def __repr__(self):
+        return f"Schedule({self.movie_id!r}, {self.showtimes!r})"
+
+
+class MovieDetails:
+    __slots__ = ("movie_id", "title", "duration", "synopsis")
+
+    def __init__(self, movie_id, title, duration, synopsis=""):
+        self.movie_id = movie_id
+        self.title = title
+        self.duration = duration
+        self.synopsis = synopsis
+
+    @classmethod
+    def from_dict(cls, data, movie_id=None):
+        # movie_id fills in for responses that do not echo it back.
+        if not isinstance(data, dict):
+            raise InvalidRecord(f"movie details are not an object: {data!r}")
+        movie_id = data.get("movie_id", movie_id)
+        title = _require(data, "title", str)
+        duration = _require(data, "duration", (int, float))
+        synopsis = data.get("synopsis") or ""
+        if not isinstance(synopsis, str):
+            raise InvalidRecord(f"'synopsis' is not a string: {synopsis!r}")
+        return cls(None if movie_id is None else str(movie_id), title, duration, synopsis)
+
+    def to_dict(self):
+        return {"movie_id": self.movie_id, "title": self.title, "duration": self.duration, "synopsis": self.synopsis}
+
+    def __eq__(self, other):
+        if not isinstance(other, MovieDetails):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"MovieDetails({self.movie_id!r}, {self.title!r})"
+
+
+def parse_schedules(data):
+    if not isinstance(data, list):
+        raise InvalidRecord(f"schedules are not a list: {type(data).__name__}")
+    return [Schedule.from_dict(schedule) for schedule in data]
+
+
+def parse_movie_ids(data):
+    # Movie ids as Schedule.from_dict stores them, so they compare equal.
+    if not isinstance(data, list):
+        raise InvalidRecord(f"movie ids are not a list: {type(data).__name__}")
+    for movie_id in data:
+        if not isinstance(movie_id, (str, int)) or isinstance(movie_id, bool):
+            raise InvalidRecord(f"movie id is not a string or integer: {movie_id!r}")
+    return [str(movie_id) for movie_id in data]
+
+
+def decode_schedules(data):
+    return parse_schedules(decode_json(data))
+
+
+def decode_movie_details(data, movie_id=None):
+    return MovieDetails.from_dict(decode_json(data), movie_id)
+
+
+def record_to_json(value):
+    # json.dumps default= hook for values that hold records.
+    if isinstance(value, (Schedule, MovieDetails)):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# Rebuilds records from the plain JSON a response cache persisted, by endpoint.
+RESPONSE_DECODERS = {
+    "schedules": parse_schedules,
+    "movie_details": MovieDetails.from_dict
+}
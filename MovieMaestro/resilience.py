@@ -0,0 +1,119 @@
+import threading
+import time
+
+import requests
+
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+# A request that would have to queue longer than this for a token is refused.
+DEFAULT_MAX_WAIT = 5.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    pass
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+class TokenBucket:
+    # Allows `rate` requests per second on average with bursts of up to
+    # `burst`. A caller that finds the bucket empty reserves the next token
+    # and sleeps until it is due, so concurrent callers queue in order.
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_wait=DEFAULT_MAX_WAIT,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(burst)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+        self.throttled = 0
+        self.refused = 0
+
+    def acquire(self):
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self._tokens + (now - self._updated_at) * self.rate, self.burst)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            wait = (1 - self._tokens) / self.rate
+            if wait > self.max_wait:
+                self.refused += 1
+                return False
+            self._tokens -= 1
+            self.throttled += 1
+        self.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures and rejects calls
+    # until `reset_timeout` has passed. Then a single probe is let through
+    # (half-open): its success closes the breaker, its failure re-opens it.
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and self.clock() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def abandon(self):
+        # The call allow() let through was never made; a half-open breaker
+        # lets the next one probe instead.
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self._opened_at = self.clock()
+                self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,186 @@
+import bisect
+import sys
+from array import array
+from records import Schedule
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def showtime_minutes(showtime):
+    # None for anything that is not a time of day, so it cannot overflow the
+    # store's 16-bit minutes column.
+    hours, _, minutes = str(showtime).partition(":")
+    try:
+        value = int(hours) * 60 + int(minutes[:2] or 0)
+    except ValueError:
+        return None
+    return value if 0 <= value < MINUTES_PER_DAY else None
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Showing:
+    __slots__ = ("movie_id", "location", "date", "showtime", "minutes")
+
+    def __init__(self, movie_id, location, date, showtime, minutes):
+        self.movie_id = movie_id
+        self.location = location
+        self.date = date
+        self.showtime = showtime
+        self.minutes = minutes
+
+    def __repr__(self):
+        return f"Showing({self.movie_id!r}, {self.location!r}, {self.date!r}, {self.showtime!r})"
+
+
+class ScheduleStore:
+    # Showtimes are kept column-wise: interned movie ids and showtime strings
+    # plus compact arrays for minutes-after-midnight and the owning search.
+    # Each (location, date) search occupies one contiguous block sorted by
+    # showtime, so time ranges inside a block are a bisect; per-movie lookups
+    # go through a position index.
+    def __init__(self):
+        self._movie_ids = []
+        self._showtimes = []
+        self._minutes = array("h")
+        self._block_codes = array("I")
+        self._live = bytearray()
+        self._block_keys = []
+        self._blocks = {}
+        self._by_movie = {}
+        self._times_by_movie = {}
+        self._removed = 0
+
+    def __len__(self):
+        return sum(end - start for start, end, _, _ in self._blocks.values())
+
+    def add_schedules(self, location, date, schedules):
+        # Replaces whatever was held for this (location, date) search. Rows are
+        # built in full before any column is touched, so a bad schedule leaves
+        # the store as it was instead of with columns out of step.
+        location = _intern(location)
+        date = _intern(date)
+
+        rows = []
+        movie_ids = []
+        positions_by_order = []
+        for order, schedule in enumerate(schedules):
+            movie_id = _intern(schedule.movie_id)
+            movie_ids.append(movie_id)
+            positions_by_order.append([0] * len(schedule.showtimes))
+            for index, showtime in enumerate(schedule.showtimes):
+                minutes = showtime_minutes(showtime)
+                rows.append((minutes if minutes is not None else -1, order, index, movie_id, _intern(showtime)))
+        rows.sort(key=lambda row: row[0])
+        minutes_column = array("h", (row[0] for row in rows))
+
+        self.remove_schedules(location, date)
+        block_code = len(self._block_keys)
+        self._block_keys.append((location, date))
+        start = len(self._minutes)
+        self._minutes.extend(minutes_column)
+        for position, (_, order, index, movie_id, showtime) in enumerate(rows, start):
+            self._movie_ids.append(movie_id)
+            self._showtimes.append(showtime)
+            self._block_codes.append(block_code)
+            self._live.append(1)
+            self._by_movie.setdefault(movie_id, array("I")).append(position)
+            positions_by_order[order][index] = position
+
+        entries = [(movie_id, array("I", positions)) for movie_id, positions in zip(movie_ids, positions_by_order)]
+        self._blocks[(location, date)] = (start, len(self._minutes), block_code, entries)
+        for movie_id in set(movie_ids):
+            self._times_by_movie.pop(movie_id, None)
+
+    def remove_schedules(self, location, date):
+        block = self._blocks.pop((location, date), None)
+        if block is None:
+            return
+        start, end, _, entries = block
+        self._live[start:end] = bytes(end - start)
+        self._removed += end - start
+        for movie_id, _ in entries:
+            self._times_by_movie.pop(movie_id, None)
+
+        if self._removed > 1024 and self._removed * 2 > len(self._live):
+            self._compact()
+
+    def has_schedules(self, location, date):
+        return (location, date) in self._blocks
+
+    def get_schedules(self, location, date):
+        block = self._blocks.get((location, date))
+        if block is None:
+            return None
+        return [self._schedule(movie_id, positions) for movie_id, positions in block[3]]
+
+    def get_schedule(self, location, date, index):
+        block = self._blocks.get((location, date))
+        if block is None or not 0 <= index < len(block[3]):
+            return None
+        return self._schedule(*block[3][index])
+
+    def find(self, movie_id=None, location=None, date=None, after=None, before=None):
+        # after/before are inclusive "HH:MM" bounds.
+        low_minutes = showtime_minutes(after) if after is not None else None
+        high_minutes = showtime_minutes(before) if before is not None else None
+        has_range = low_minutes is not None or high_minutes is not None
+        low_minutes = max(low_minutes or 0, 0) if has_range else -1
+        high_minutes = high_minutes if high_minutes is not None else sys.maxsize
+
+        if movie_id is not None:
+            if has_range:
+                minutes, positions = self._movie_times(movie_id)
+                positions = positions[bisect.bisect_left(minutes, low_minutes):
+                                      bisect.bisect_right(minutes, high_minutes)]
+            else:
+                positions = [position for position in self._by_movie.get(movie_id, ()) if self._live[position]]
+            if location is not None or date is not None:
+                block_codes = {block[2] for key, block in self._blocks.items()
+                               if (location is None or key[0] == location) and (date is None or key[1] == date)}
+                positions = [position for position in positions if self._block_codes[position] in block_codes]
+        else:
+            positions = []
+            for (block_location, block_date), (start, end, _, _) in self._blocks.items():
+                if location is not None and block_location != location:
+                    continue
+                if date is not None and block_date != date:
+                    continue
+                low = bisect.bisect_left(self._minutes, low_minutes, start, end)
+                high = bisect.bisect_right(self._minutes, high_minutes, start, end)
+                positions.extend(range(low, high))
+
+        showings = [self._showing(position) for position in positions]
+        showings.sort(key=lambda showing: (showing.date, showing.minutes))
+        return showings
+
+    def movie_ids(self):
+        return list({movie_id for _, _, _, entries in self._blocks.values() for movie_id, _ in entries})
+
+    def _showing(self, position):
+        location, date = self._block_keys[self._block_codes[position]]
+        return Showing(self._movie_ids[position], location, date, self._showtimes[position], self._minutes[position])
+
+    def _schedule(self, movie_id, positions):
+        return Schedule(movie_id, tuple(self._showtimes[position] for position in positions))
+
+    def _movie_times(self, movie_id):
+        times = self._times_by_movie.get(movie_id)
+        if times is None:
+            pairs = sorted(
+                (self._minutes[position], position) for position in self._by_movie.get(movie_id, ())
+                if self._live[position] and self._minutes[position] >= 0
+            )
+            times = ([minutes for minutes, _ in pairs], [position for _, position in pairs])
+            self._times_by_movie[movie_id] = times
+        return times
+
+    def _compact(self):
+        # Replaced searches leave dead rows behind; rebuild from the live
+        # blocks once the dead rows outnumber them.
+        held = {key: self.get_schedules(*key) for key in self._blocks}
+        self.__init__()
+        for (location, date), schedules in held.items():
+            self.add_schedules(location, date, schedules)
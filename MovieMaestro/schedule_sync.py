@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+
+SYNC_CURSOR_HEADER = "X-Sync-Cursor"
+DEFAULT_MAX_STATES = 256
+# Status codes meaning the upstream has no schedule changes endpoint.
+DELTA_UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+
+
+class SyncState:
+    __slots__ = ("etag", "last_modified", "cursor", "schedules")
+
+    def __init__(self, etag, last_modified, cursor, schedules):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cursor = cursor
+        self.schedules = schedules
+
+
+def merge_schedule_changes(schedules, changed, removed):
+    # Returns a new list: changed schedules replace those with the same
+    # movie_id in place, unknown ones are appended and removed ids dropped.
+    # The old list is left alone since other threads may still read it.
+    removed = {str(movie_id) for movie_id in removed}
+    changed_by_id = {schedule.movie_id: schedule for schedule in changed}
+    merged = []
+    for schedule in schedules:
+        movie_id = schedule.movie_id
+        if movie_id in removed:
+            continue
+        merged.append(changed_by_id.pop(movie_id, schedule))
+    merged.extend(schedule for movie_id, schedule in changed_by_id.items() if movie_id not in removed)
+    return merged
+
+
+def response_bytes(response):
+    # Bytes on the wire: Content-Length is the compressed size when the body
+    # was gzipped, len(content) the decoded one.
+    size = response.headers.get("Content-Length")
+    return int(size) if size is not None else len(response.content)
+
+
+class ScheduleSyncStore:
+    # Validators, delta cursor and the last full schedule list per search,
+    # kept so a refetch can be a conditional request or a delta sync.
+    def __init__(self, max_states=DEFAULT_MAX_STATES):
+        self.max_states = max_states
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.full_fetches = 0
+        self.not_modified = 0
+        self.delta_syncs = 0
+        self.bytes_received = 0
+
+    def get(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+            return state
+
+    def conditional_headers(self, key):
+        state = self.get(key)
+        headers = {}
+        if state is not None:
+            if state.etag:
+                headers["If-None-Match"] = state.etag
+            if state.last_modified:
+                headers["If-Modified-Since"] = state.last_modified
+        return headers
+
+    def remember(self, key, response, schedules):
+        state = SyncState(response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                          response.headers.get(SYNC_CURSOR_HEADER), schedules)
+        with self._lock:
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_states:
+                self._states.popitem(last=False)
+
+    def advance(self, key, cursor, schedules):
+        # After a delta sync the validators no longer describe the list.
+        with self._lock:
+            self._states[key] = SyncState(None, None, cursor, schedules)
+            self._states.move_to_end(key)
+
+    def record(self, outcome, size):
+        with self._lock:
+            if outcome == "full":
+                self.full_fetches += 1
+            elif outcome == "not_modified":
+                self.not_modified += 1
+            elif outcome == "delta":
+                self.delta_syncs += 1
+            self.bytes_received += size
+
+    def stats(self):
+        with self._lock:
+            return {
+                "full_fetches": self.full_fetches,
+                "not_modified": self.not_modified,
+                "delta_syncs": self.delta_syncs,
+                "bytes_received": self.bytes_received,
+                "tracked": len(self._states)
+            }
@@ -0,0 +1,242 @@
+import bisect
+import heapq
+import re
+import threading
+from operator import itemgetter
+
+TOKEN_PATTERN = re.compile(r"\w+")
+TITLE_WEIGHT = 3.0
+SYNOPSIS_WEIGHT = 1.0
+# A word matched by prefix or by a typo counts for less than a whole word.
+PREFIX_FACTOR = 0.6
+FUZZY_FACTOR = 0.4
+# Typo tolerance applies to title words of this length and up, one edit away.
+MIN_FUZZY_LENGTH = 4
+# Caps how many indexed words one short prefix may expand to.
+MAX_PREFIX_EXPANSIONS = 200
+# Shorter query words match titles only; in synopses they would hit almost
+# every movie ("a", "an", "th...") and cost more than they narrow. Synopsis
+# words are common enough that a prefix expands to fewer of them.
+MIN_SYNOPSIS_WORD_LENGTH = 3
+MAX_SYNOPSIS_PREFIX_EXPANSIONS = 50
+# Up to this many new words are inserted one by one; more are merged by a sort.
+MAX_WORD_INSERTS = 1000
+DEFAULT_SEARCH_LIMIT = 50
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def _deletes(token):
+    return {token[:index] + token[index + 1:] for index in range(len(token))}
+
+
+def _within_one_edit(a, b):
+    # One insertion, deletion, substitution or swap of neighbouring letters.
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    start = 0
+    while start < len(a) and a[start] == b[start]:
+        start += 1
+    if len(a) < len(b):
+        return a[start:] == b[start + 1:]
+    if a[start + 1:] == b[start + 1:]:
+        return True
+    return (start + 1 < len(a) and a[start] == b[start + 1] and a[start + 1] == b[start]
+            and a[start + 2:] == b[start + 2:])
+
+
+class SearchHit:
+    __slots__ = ("movie_id", "title", "score")
+
+    def __init__(self, movie_id, title, score):
+        self.movie_id = movie_id
+        self.title = title
+        self.score = score
+
+    def __repr__(self):
+        return f"SearchHit({self.movie_id!r}, {self.title!r}, {self.score:.2f})"
+
+
+class MovieSearchIndex:
+    # An in-memory inverted index over movie titles and synopses. Every query
+    # word has to match, as a whole word, as the prefix of a word (so results
+    # follow typing) or, for title words, one typo away; title matches rank
+    # above synopsis matches. Movies are added or replaced one at a time as
+    # their details arrive, from any thread.
+    def __init__(self):
+        self._docs = {}
+        self._title_postings = {}
+        self._synopsis_postings = {}
+        # Every indexed word, sorted, for prefix lookups; new words wait in
+        # _new_words and are merged in by the next search
+        self._words = []
+        self._new_words = set()
+        # Title word with one letter deleted -> title words it came from
+        self._title_deletes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, movie_id):
+        return movie_id in self._docs
+
+    def add(self, movie_details):
+        movie_id = movie_details.movie_id
+        if movie_id is None:
+            return
+        with self._lock:
+            indexed = self._docs.get(movie_id)
+            if indexed is not None:
+                if indexed[0] is movie_details:
+                    return
+                self._remove(movie_id)
+            title_words = set(tokenize(movie_details.title))
+            synopsis_words = set(tokenize(movie_details.synopsis)) - title_words
+            self._docs[movie_id] = (movie_details, title_words, synopsis_words)
+            for word in title_words:
+                self._post(self._title_postings, word, movie_id)
+                if len(word) >= MIN_FUZZY_LENGTH and len(self._title_postings[word]) == 1:
+                    for variant in _deletes(word):
+                        self._title_deletes.setdefault(variant, set()).add(word)
+            for word in synopsis_words:
+                self._post(self._synopsis_postings, word, movie_id)
+
+    def add_many(self, movie_details_list):
+        for movie_details in movie_details_list:
+            if movie_details:
+                self.add(movie_details)
+        with self._lock:
+            self._merge_new_words()
+
+    def remove(self, movie_id):
+        with self._lock:
+            self._remove(movie_id)
+
+    def get(self, movie_id):
+        indexed = self._docs.get(movie_id)
+        return indexed[0] if indexed is not None else None
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        # Each word also matches as a prefix, so results follow typing.
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            self._merge_new_words()
+            scores = None
+            for word in words:
+                word_scores = self._score_word(word)
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {movie_id: score + word_scores[movie_id]
+                              for movie_id, score in scores.items() if movie_id in word_scores}
+                if not scores:
+                    return []
+            top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+            hits = [SearchHit(movie_id, self._docs[movie_id][0].title, score) for movie_id, score in top]
+        hits.sort(key=lambda hit: (-hit.score, hit.title.lower()))
+        return hits
+
+    def _merge_new_words(self):
+        if len(self._new_words) <= MAX_WORD_INSERTS:
+            for word in self._new_words:
+                bisect.insort(self._words, word)
+        else:
+            # Appending a sorted run keeps the sort close to linear
+            self._words.extend(sorted(self._new_words))
+            self._words.sort()
+        self._new_words.clear()
+
+    def _score_word(self, word):
+        scores = {}
+        scores_get = scores.get
+
+        def credit(postings, weight):
+            for movie_id in postings:
+                if scores_get(movie_id, 0) < weight:
+                    scores[movie_id] = weight
+
+        def credit_new(postings, weight):
+            # Synopsis matches are worth less than any match already credited
+            # (the whole word comes first in sorted order), so only movies
+            # not seen yet need a score; done in C for the long lists.
+            scores.update(dict.fromkeys(postings.difference(scores), weight))
+
+        synopsis_expansions = MAX_SYNOPSIS_PREFIX_EXPANSIONS if len(word) >= MIN_SYNOPSIS_WORD_LENGTH else 0
+        start = bisect.bisect_left(self._words, word)
+        for indexed_word in self._words[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not indexed_word.startswith(word):
+                break
+            factor = 1.0 if indexed_word == word else PREFIX_FACTOR
+            credit(self._title_postings.get(indexed_word, ()), TITLE_WEIGHT * factor)
+            synopsis_postings = self._synopsis_postings.get(indexed_word) if synopsis_expansions else None
+            if synopsis_postings:
+                credit_new(synopsis_postings, SYNOPSIS_WEIGHT * factor)
+                synopsis_expansions -= 1
+
+        if len(word) >= MIN_FUZZY_LENGTH:
+            for candidate in self._fuzzy_title_words(word):
+                credit(self._title_postings[candidate], TITLE_WEIGHT * FUZZY_FACTOR)
+        return scores
+
+    def _fuzzy_title_words(self, word):
+        # Words one edit away share a one-letter deletion with the query, or
+        # one is a deletion of the other.
+        candidates = set(self._title_deletes.get(word, ()))
+        for variant in _deletes(word):
+            if variant in self._title_postings:
+                candidates.add(variant)
+            candidates.update(self._title_deletes.get(variant, ()))
+        candidates.discard(word)
+        return [candidate for candidate in candidates if _within_one_edit(word, candidate)]
+
+    def _post(self, postings, word, movie_id):
+        movie_ids = postings.get(word)
+        if movie_ids is None:
+            movie_ids = postings[word] = set()
+            other = self._synopsis_postings if postings is self._title_postings else self._title_postings
+            if word not in other:
+                self._new_words.add(word)
+        movie_ids.add(movie_id)
+
+    def _remove(self, movie_id):
+        indexed = self._docs.pop(movie_id, None)
+        if indexed is None:
+            return
+        _, title_words, synopsis_words = indexed
+        for word in title_words:
+            if self._unpost(self._title_postings, word, movie_id) and len(word) >= MIN_FUZZY_LENGTH:
+                for variant in _deletes(word):
+                    words = self._title_deletes.get(variant)
+                    if words is not None:
+                        words.discard(word)
+                        if not words:
+                            del self._title_deletes[variant]
+        for word in synopsis_words:
+            self._unpost(self._synopsis_postings, word, movie_id)
+
+    def _unpost(self, postings, word, movie_id):
+        # Returns True when no movie is left under the word.
+        movie_ids = postings.get(word)
+        if movie_ids is None:
+            return False
+        movie_ids.discard(movie_id)
+        if movie_ids:
+            return False
+        del postings[word]
+        if word not in self._title_postings and word not in self._synopsis_postings:
+            if word in self._new_words:
+                self._new_words.discard(word)
+            else:
+                index = bisect.bisect_left(self._words, word)
+                if index < len(self._words) and self._words[index] == word:
+                    del self._words[index]
+        return True
@@ -0,0 +1,71 @@
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first caller
+    # runs the function, the rest wait for it and receive the same result (or
+    # exception). Nothing is remembered once the call finishes.
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.collapsed = 0
+
+    def do(self, key, func):
+        leader, result = self.acquire(key)
+        if not leader:
+            return result
+
+        try:
+            result = func()
+        except Exception as e:
+            self.release(key, error=e)
+            raise
+        self.release(key, result)
+        return result
+
+    def acquire(self, key):
+        # Returns (True, None) when the caller leads and must release(key, ...)
+        # once it has the result, or (False, result) after waiting for the
+        # current leader. Lets a caller that streams the result lead the call.
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if leader:
+            return True, None
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return False, call.result
+
+    def release(self, key, result=None, error=None):
+        with self._lock:
+            call = self._calls.pop(key)
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls)
+            }
@@ -0,0 +1,118 @@
+import importlib
+import importlib.util
+import json
+import sys
+import threading
+import time
+
+STARTUP_PROFILE_FLAG = "--profile-startup"
+STARTUP_CHILD_FLAG = "--startup-child"
+DEFAULT_TOP_IMPORTS = 15
+IMPORT_TIME_PATTERN = r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)"
+
+
+class _LazyModule:
+    # Stands in for a module until an attribute is first used, then imports
+    # it under a lock. Unlike importlib's LazyLoader nothing half-loaded is
+    # put in sys.modules, so the first use may come from any thread.
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return getattr(module, attribute)
+
+
+def lazy_module(name):
+    # Returns the module, deferring its actual import until an attribute is
+    # first used. Already imported modules are returned as they are.
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
+
+
+class StartupTimer:
+    # Records named milestones relative to process start. Disabled timers
+    # ignore marks, so entry points can call mark() unconditionally.
+    def __init__(self, enabled=False, started_at=None):
+        self.enabled = enabled
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.marks = []
+
+    def mark(self, name):
+        if self.enabled:
+            self.marks.append((name, round((time.perf_counter() - self.started_at) * 1000, 1)))
+
+    def as_dict(self):
+        return dict(self.marks)
+
+
+startup_timer = StartupTimer()
+
+
+def parse_import_times(stderr, top=DEFAULT_TOP_IMPORTS):
+    # Turns `python -X importtime` output into the slowest top-level imports
+    # (cumulative, children included), the total, and the slowest modules at
+    # any depth by their own time, so a costly nested import is not hidden
+    # behind the top-level module that pulled it in.
+    import re
+    top_level = []
+    modules = []
+    for line in stderr.splitlines():
+        match = re.match(IMPORT_TIME_PATTERN, line)
+        if not match:
+            continue
+        depth = max(len(match.group(3)) - 1, 0) // 2
+        self_ms = int(match.group(1)) / 1000
+        cumulative_ms = int(match.group(2)) / 1000
+        if depth == 0:
+            top_level.append((match.group(4), cumulative_ms))
+        modules.append((match.group(4), depth, self_ms, cumulative_ms))
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    modules.sort(key=lambda item: item[2], reverse=True)
+    return {
+        "total_ms": round(sum(ms for _, ms in top_level), 1),
+        "slowest_ms": {name: round(ms, 1) for name, ms in top_level[:top]},
+        "slowest_self_ms": {
+            name: {"self_ms": round(self_ms, 1), "cumulative_ms": round(cumulative_ms, 1), "depth": depth}
+            for name, depth, self_ms, cumulative_ms in modules[:top]
+        }
+    }
+
+
+def profile_startup(script, args=()):
+    # Re-runs the entry point under -X importtime in a child that exits once
+    # the first window is ready, and combines its milestones with the import
+    # breakdown. Returns the report as a dict.
+    import subprocess
+    command = [sys.executable, "-X", "importtime", script, STARTUP_CHILD_FLAG] + list(args)
+    started_at = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    wall_ms = round((time.perf_counter() - started_at) * 1000, 1)
+
+    marks = {}
+    for line in result.stdout.splitlines():
+        if line.startswith("{"):
+            try:
+                marks = json.loads(line)
+            except ValueError:
+                pass
+    report = {
+        "wall_ms": wall_ms,
+        "milestones_ms": marks,
+        "imports": parse_import_times(result.stderr)
+    }
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if line and not line.startswith("import time:")]
+        report["error"] = errors[-1] if errors else "child failed"
+    return report
@@ -0,0 +1,328 @@
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qsl
+
+DEFAULT_SCHEDULE_COUNT = 200
+DEFAULT_SHOWTIMES_PER_SCHEDULE = 4
+DEFAULT_SYNOPSIS_BYTES = 400
+# Bodies smaller than this are not worth gzipping.
+COMPRESS_MIN_BYTES = 512
+COMPRESS_LEVEL = 5
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping pooled keep-alive connections is routine here
+        pass
+
+
+class StubAPIServer:
+    # A local stand-in for the movie, ticketing and email APIs with
+    # configurable latency, payload size and error rate, so the client paths
+    # can be measured without touching the real services. Every endpoint the
+    # clients call is answered on one port regardless of host.
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0,
+                 schedule_count=DEFAULT_SCHEDULE_COUNT, showtimes_per_schedule=DEFAULT_SHOWTIMES_PER_SCHEDULE,
+                 synopsis_bytes=DEFAULT_SYNOPSIS_BYTES, sold_out_rate=0.0, seed=0, compress=False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.schedule_count = schedule_count
+        self.showtimes_per_schedule = showtimes_per_schedule
+        self.synopsis_bytes = synopsis_bytes
+        self.sold_out_rate = sold_out_rate
+        self.compress = compress
+        self._started_at = time.time()
+        # Per (location, date): the movie ids changed by each version and the
+        # schedules as they stand after the latest one
+        self._history = {}
+        self._modified_at = {}
+        self._overrides = {}
+        self._schedules_lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._requests = {}
+        self._bytes_sent = {}
+        self._failures_due = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._requests_lock = threading.Lock()
+        self._server = _QuietHTTPServer((host, port), _handler_class(self))
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def request_counts(self):
+        with self._requests_lock:
+            return dict(self._requests)
+
+    def fail_next(self, count=1):
+        # The next `count` responses are 503s whatever the error rate.
+        with self._requests_lock:
+            self._failures_due += count
+
+    def max_in_flight(self):
+        # The most requests that were being answered at the same time.
+        with self._requests_lock:
+            return self._max_in_flight
+
+    def bytes_sent(self):
+        # Response body bytes per endpoint, after compression.
+        with self._requests_lock:
+            return dict(self._bytes_sent)
+
+    def schedules(self, location, date):
+        showtimes = [f"{10 + index * 12 // max(self.showtimes_per_schedule, 1):02d}:{index * 5 % 60:02d}"
+                     for index in range(self.showtimes_per_schedule)]
+        with self._schedules_lock:
+            overrides = dict(self._overrides.get((location, date), {}))
+        # A removed movie is overridden with None
+        schedules = (overrides.get(f"m{index}", {"movie_id": f"m{index}", "showtimes": list(showtimes)})
+                     for index in range(self.schedule_count))
+        return [schedule for schedule in schedules if schedule is not None]
+
+    def schedule_version(self, location, date):
+        with self._schedules_lock:
+            return len(self._history.get((location, date), ())), self._modified_at.get((location, date),
+                                                                                        self._started_at)
+
+    def mutate_schedules(self, location, date, count=1):
+        # Moves the showtimes of `count` movies and returns the new version,
+        # which is also the sync cursor clients get for it.
+        with self._schedules_lock:
+            history = self._history.setdefault((location, date), [])
+            overrides = self._overrides.setdefault((location, date), {})
+            version = len(history) + 1
+            movie_ids = [f"m{(version * count + offset) % max(self.schedule_count, 1)}" for offset in range(count)]
+            for movie_id in movie_ids:
+                overrides[movie_id] = {
+                    "movie_id": movie_id,
+                    "showtimes": [f"{10 + (version + index) % 12:02d}:{version * 5 % 60:02d}"
+                                  for index in range(self.showtimes_per_schedule)]
+                }
+            history.append(movie_ids)
+            self._modified_at[(location, date)] = time.time()
+            return version
+
+    def remove_schedules(self, location, date, movie_ids):
+        # Drops the schedules of `movie_ids` and returns the new version.
+        with self._schedules_lock:
+            history = self._history.setdefault((location, date), [])
+            overrides = self._overrides.setdefault((location, date), {})
+            for movie_id in movie_ids:
+                overrides[movie_id] = None
+            history.append(list(movie_ids))
+            self._modified_at[(location, date)] = time.time()
+            return len(history)
+
+    def schedule_changes(self, location, date, since):
+        # The schedules changed after version `since`, or None when the cursor
+        # is unknown and the client has to fetch the full list again.
+        schedules = {schedule["movie_id"]: schedule for schedule in self.schedules(location, date)}
+        with self._schedules_lock:
+            history = list(self._history.get((location, date), ()))
+        if since < 0 or since > len(history):
+            return None
+        changed = {movie_id for movie_ids in history[since:] for movie_id in movie_ids}
+        return {
+            "cursor": str(len(history)),
+            "changed": [schedules[movie_id] for movie_id in sorted(changed) if movie_id in schedules],
+            "removed": sorted(changed.difference(schedules))
+        }
+
+    def movie_details(self, movie_id):
+        return {
+            "movie_id": movie_id,
+            "title": f"Movie {movie_id}",
+            "duration": 90 + len(movie_id) * 7 % 60,
+            "synopsis": "x" * self.synopsis_bytes
+        }
+
+    def _record(self, endpoint):
+        with self._requests_lock:
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+
+    def _record_bytes(self, endpoint, size):
+        with self._requests_lock:
+            self._bytes_sent[endpoint] = self._bytes_sent.get(endpoint, 0) + size
+
+    def _begin_response(self):
+        with self._requests_lock:
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+    def _end_response(self):
+        with self._requests_lock:
+            self._in_flight -= 1
+
+    def _failure_due(self):
+        with self._requests_lock:
+            if self._failures_due <= 0:
+                return False
+            self._failures_due -= 1
+            return True
+
+    def _roll(self, rate):
+        with self._random_lock:
+            return self._random.random() < rate
+
+
+def _handler_class(stub):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; with Nagle on, every
+        # response with a body would wait out the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            params = dict(parse_qsl(query))
+            if path == "/schedules":
+                location, date = params.get("location"), params.get("date")
+                version, modified_at = stub.schedule_version(location, date)
+                headers = {
+                    "ETag": f'"v{version}"',
+                    "Last-Modified": formatdate(modified_at, usegmt=True),
+                    "X-Sync-Cursor": str(version)
+                }
+                if self._not_modified(headers["ETag"], modified_at):
+                    self._respond("schedules_not_modified", status=304, headers=headers)
+                    return
+                schedules = stub.schedules(location, date)
+                if "ndjson" in self.headers.get("Accept", ""):
+                    self._respond("schedules", lines=schedules, headers=headers)
+                else:
+                    self._respond("schedules", schedules, headers=headers)
+            elif path == "/schedules/changes":
+                try:
+                    since = int(params.get("since", ""))
+                except ValueError:
+                    since = -1
+                changes = stub.schedule_changes(params.get("location"), params.get("date"), since)
+                self._respond("schedules_changes", changes if changes is not None else {"reset": True})
+            elif path.startswith("/movies/"):
+                self._respond("movies", stub.movie_details(path[len("/movies/"):]))
+            else:
+                self._respond("unknown", {"error": "not found"}, status=404)
+
+        def _not_modified(self, etag, modified_at):
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match is not None:
+                return etag in (tag.strip() for tag in if_none_match.split(","))
+            if_modified_since = self.headers.get("If-Modified-Since")
+            if if_modified_since is not None:
+                try:
+                    return int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                payload = {}
+            if self.path == "/seats/check_availability/bulk":
+                availability = [not stub._roll(stub.sold_out_rate) for _ in payload.get("queries", [])]
+                self._respond("seats_bulk", {"availability": availability})
+            elif self.path == "/seats/check_availability":
+                self._respond("seats", {"availability": not stub._roll(stub.sold_out_rate)})
+            elif self.path == "/bookings":
+                self._respond("bookings", {"status": "success"})
+            elif self.path == "/send":
+                self._respond("send", {"status": "sent"})
+            else:
+                self._respond("unknown", {"error": "not found"}, status=404)
+
+        def _respond(self, endpoint, body=None, lines=None, status=200, headers=None):
+            stub._begin_response()
+            try:
+                self._write_response(endpoint, body, lines, status, headers)
+            finally:
+                stub._end_response()
+
+        def _write_response(self, endpoint, body, lines, status, headers):
+            stub._record(endpoint)
+            if stub.latency:
+                time.sleep(stub.latency)
+            if status == 200 and (stub._failure_due() or stub._roll(stub.error_rate)):
+                status, body, lines, headers = 503, {"error": "injected failure"}, None, None
+
+            if status == 304:
+                data = b""
+                content_type = None
+            elif lines is not None:
+                data = "".join(json.dumps(line) + "\n" for line in lines).encode()
+                content_type = "application/x-ndjson"
+            else:
+                data = json.dumps(body).encode()
+                content_type = "application/json"
+            compressed = (stub.compress and len(data) >= COMPRESS_MIN_BYTES
+                          and "gzip" in self.headers.get("Accept-Encoding", ""))
+            if compressed:
+                data = gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+            stub._record_bytes(endpoint, len(data))
+
+            self.send_response(status)
+            if content_type:
+                self.send_header("Content-Type", content_type)
+            if compressed:
+                self.send_header("Content-Encoding", "gzip")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return StubHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stub of the movie, ticketing and email APIs.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of responses that fail with 503")
+    parser.add_argument("--schedules", type=int, default=DEFAULT_SCHEDULE_COUNT)
+    parser.add_argument("--showtimes", type=int, default=DEFAULT_SHOWTIMES_PER_SCHEDULE)
+    parser.add_argument("--synopsis-bytes", type=int, default=DEFAULT_SYNOPSIS_BYTES)
+    parser.add_argument("--compress", action="store_true", help="gzip responses for clients that accept it")
+    args = parser.parse_args(argv)
+
+    stub = StubAPIServer(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                         schedule_count=args.schedules, showtimes_per_schedule=args.showtimes,
+                         synopsis_bytes=args.synopsis_bytes, compress=args.compress)
+    print(f"Stub API listening on {stub.base_url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from api_client import APIClient
+from backend_profiles import BackendProfile
+from benchmark import UNLIMITED_RATE
+from cache import ResponseCache
+from http_transport import HTTPTransport
+from stub_server import StubAPIServer
+
+
+@pytest.fixture
+def stub():
+    stub = StubAPIServer(schedule_count=10, latency=0.1).start()
+    yield stub
+    stub.stop()
+
+
+def make_client(stub):
+    transport = HTTPTransport(retries=0, rate_limits={"127.0.0.1": UNLIMITED_RATE})
+    return APIClient("key", transport=transport, cache=ResponseCache(),
+                     profile=BackendProfile.single_host(stub.base_url))
+
+
+def as_pairs(schedules):
+    return [(schedule.movie_id, tuple(schedule.showtimes)) for schedule in schedules]
+
+
+def stub_pairs(stub, location, date):
+    return [(schedule["movie_id"], tuple(schedule["showtimes"])) for schedule in stub.schedules(location, date)]
+
+
+def test_concurrent_identical_searches_share_one_request(stub):
+    client = make_client(stub)
+    barrier = threading.Barrier(6)
+    results = []
+
+    def search():
+        barrier.wait()
+        results.append(client.get_movie_schedules("Location 1", "2024-01-01"))
+
+    threads = [threading.Thread(target=search) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stub.request_counts()["schedules"] == 1
+    assert len(results) == 6
+    assert all(as_pairs(result) == stub_pairs(stub, "Location 1", "2024-01-01") for result in results)
+
+
+def test_concurrent_identical_streams_share_one_request(stub):
+    client = make_client(stub)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def stream():
+        barrier.wait()
+        results.append(list(client.iter_movie_schedules("Location 1", "2024-01-01")))
+
+    threads = [threading.Thread(target=stream) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stub.request_counts()["schedules"] == 1
+    assert all(len(result) == 10 for result in results)
+
+
+def test_delta_sync_merges_and_removes_rows_from_the_cursor(stub):
+    client = make_client(stub)
+    first = client.get_movie_schedules("Location 1", "2024-01-01")
+    assert len(first) == 10
+
+    stub.mutate_schedules("Location 1", "2024-01-01", 2)
+    stub.remove_schedules("Location 1", "2024-01-01", ["m5", "m7"])
+    client.cache.invalidate("schedules", ("Location 1", "2024-01-01"))
+    synced = client.get_movie_schedules("Location 1", "2024-01-01")
+
+    assert stub.request_counts()["schedules"] == 1
+    assert stub.request_counts()["schedules_changes"] == 1
+    assert client.sync_stats()["delta_syncs"] == 1
+    assert as_pairs(synced) == stub_pairs(stub, "Location 1", "2024-01-01")
+    assert {"m5", "m7"}.isdisjoint(schedule.movie_id for schedule in synced)
+    # The earlier list is left untouched for readers still holding it
+    assert len(first) == 10
+
+    # The cursor moved on: the next sync only carries what changed since
+    stub.remove_schedules("Location 1", "2024-01-01", ["m0"])
+    client.cache.invalidate("schedules", ("Location 1", "2024-01-01"))
+    synced = client.get_movie_schedules("Location 1", "2024-01-01")
+    assert client.sync_stats()["delta_syncs"] == 2
+    assert [schedule.movie_id for schedule in synced] == ["m1", "m2", "m3", "m4", "m6", "m8", "m9"]
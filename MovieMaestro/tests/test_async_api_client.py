@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from async_api_client import AsyncAPIClient
+from stub_server import StubAPIServer
+
+
+@pytest.fixture
+def stub():
+    stub = StubAPIServer(schedule_count=5).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def malformed_url():
+    # Answers every request with a 200 whose body is not JSON
+    class MalformedHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "8")
+            self.end_headers()
+            self.wfile.write(b"not json")
+
+        do_GET = do_POST = _reply
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MalformedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+def run(client, coroutine_func):
+    async def main():
+        async with client:
+            return await coroutine_func(client)
+    return asyncio.run(main())
+
+
+def test_fetches_schedules_and_details(stub):
+    client = AsyncAPIClient("key", base_url=stub.base_url)
+    schedules = run(client, lambda c: c.get_movie_schedules("L", "2024-01-01"))
+    assert [schedule.movie_id for schedule in schedules] == ["m0", "m1", "m2", "m3", "m4"]
+
+    client = AsyncAPIClient("key", base_url=stub.base_url)
+    details = run(client, lambda c: c.get_movie_details_many(["m1", "m2", "m1"]))
+    assert [movie_details.title for movie_details in details] == ["Movie m1", "Movie m2", "Movie m1"]
+    assert stub.request_counts()["movies"] == 2
+
+
+def test_get_retries_transient_failures(stub):
+    stub.fail_next(2)
+    client = AsyncAPIClient("key", base_url=stub.base_url, retries=3, backoff_factor=0.05)
+    started_at = time.monotonic()
+    schedules = run(client, lambda c: c.get_movie_schedules("L", "2024-01-01"))
+    elapsed = time.monotonic() - started_at
+
+    assert len(schedules) == 5
+    assert stub.request_counts()["schedules"] == 3
+    # Backoff doubles: 0.05s then 0.1s before the third attempt
+    assert elapsed >= 0.15
+
+
+def test_get_gives_up_after_retries(stub):
+    stub.fail_next(10)
+    client = AsyncAPIClient("key", base_url=stub.base_url, retries=2, backoff_factor=0)
+    assert run(client, lambda c: c.get_movie_details("m1")) is None
+    assert stub.request_counts()["movies"] == 3
+
+
+def test_post_is_not_retried(stub):
+    stub.fail_next(1)
+    client = AsyncAPIClient("key", base_url=stub.base_url, retries=3, backoff_factor=0)
+    assert run(client, lambda c: c.make_ticket_booking("m1", "10:00", 2)) is False
+    assert stub.request_counts()["bookings"] == 1
+
+
+def test_limit_per_host_caps_concurrent_requests(stub):
+    stub.latency = 0.05
+    client = AsyncAPIClient("key", base_url=stub.base_url, limit_per_host=2)
+    movie_ids = [f"m{index}" for index in range(10)]
+    details = run(client, lambda c: c.get_movie_details_many(movie_ids))
+
+    assert all(details)
+    assert stub.max_in_flight() == 2
+
+
+def test_malformed_bodies_are_reported_as_failures(malformed_url):
+    client = AsyncAPIClient("key", base_url=malformed_url, retries=0)
+
+    async def calls(c):
+        return (await c.get_movie_schedules("L", "2024-01-01"),
+                await c.get_movie_details("m1"),
+                await c.check_seat_availability("m1", "10:00", 1),
+                await c.make_ticket_booking("m1", "10:00", 1))
+
+    assert run(client, calls) == (None, None, False, False)
+
+
+def test_unreachable_host_is_reported_as_failure():
+    # Nothing listens on the port of a server that was just closed
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    host, port = server.server_address[:2]
+    server.server_close()
+    client = AsyncAPIClient("key", base_url=f"http://{host}:{port}", retries=1, backoff_factor=0)
+
+    async def calls(c):
+        return (await c.get_movie_schedules("L", "2024-01-01"),
+                await c.check_seat_availability("m1", "10:00", 1),
+                await c.send_booking_confirmation_email("m1", "10:00", 1))
+
+    assert run(client, calls) == (None, False, False)
@@ -0,0 +1,50 @@
+import pytest
+
+from api_client import APIClient
+from backend_profiles import BackendProfile, EMAIL, TICKETING
+from benchmark import UNLIMITED_RATE
+from cache import ResponseCache
+from http_transport import HTTPTransport
+from stub_server import StubAPIServer
+
+
+@pytest.fixture
+def stub():
+    stub = StubAPIServer(schedule_count=5).start()
+    yield stub
+    stub.stop()
+
+
+def make_client(stub, failure_threshold=2):
+    transport = HTTPTransport(retries=0, rate_limits={"127.0.0.1": UNLIMITED_RATE},
+                              failure_threshold=failure_threshold, reset_timeout=60)
+    # Every service behind one host, as with the gateway profile
+    return APIClient("key", transport=transport, cache=ResponseCache(),
+                     profile=BackendProfile.single_host(stub.base_url))
+
+
+def test_failing_service_does_not_trip_another_services_breaker(stub):
+    client = make_client(stub)
+    stub.fail_next(2)
+    assert not client.send_booking_confirmation_email("m1", "18:00", 2)
+    assert not client.send_booking_confirmation_email("m1", "18:00", 2)
+
+    stats = client.upstream_stats()
+    assert stats[f"{EMAIL}@127.0.0.1"]["state"] == "open"
+    # The open email breaker rejects without reaching the server
+    assert not client.send_booking_confirmation_email("m1", "18:00", 2)
+    assert stub.request_counts()["send"] == 2
+
+    assert client.make_ticket_booking("m1", "18:00", 2)
+    assert client.upstream_stats()[f"{TICKETING}@127.0.0.1"]["state"] == "closed"
+
+
+def test_rate_limits_can_be_set_per_service(stub):
+    transport = HTTPTransport(retries=0, rate_limits={("127.0.0.1", EMAIL): (0.001, 1),
+                                                     "127.0.0.1": UNLIMITED_RATE})
+    client = APIClient("key", transport=transport, cache=ResponseCache(),
+                       profile=BackendProfile.single_host(stub.base_url))
+    assert client.send_booking_confirmation_email("m1", "18:00", 2)
+    assert not client.send_booking_confirmation_email("m1", "18:00", 2)
+    assert client.make_ticket_booking("m1", "18:00", 2)
+    assert client.make_ticket_booking("m1", "18:00", 2)
@@ -0,0 +1,62 @@
+import time
+import tkinter as tk
+
+import pytest
+
+from api_client import APIClient
+from backend_profiles import BackendProfile
+from benchmark import UNLIMITED_RATE
+from cache import ResponseCache
+from http_transport import HTTPTransport
+from stub_server import StubAPIServer
+from virtual_table import VirtualTable
+
+
+def _find(widget, widget_type):
+    for child in widget.winfo_children():
+        if isinstance(child, widget_type):
+            return child
+        found = _find(child, widget_type)
+        if found is not None:
+            return found
+    return None
+
+
+@pytest.fixture
+def window(tmp_path):
+    try:
+        from main_window import MainWindow
+        window = MainWindow()
+    except tk.TclError as e:
+        pytest.skip(f"needs a display: {e}")
+    stub = StubAPIServer(schedule_count=30).start()
+    transport = HTTPTransport(retries=0, rate_limits={"127.0.0.1": UNLIMITED_RATE})
+    client = APIClient("key", transport=transport, cache=ResponseCache(),
+                       profile=BackendProfile.single_host(stub.base_url))
+    window.attach_client(client, email_outbox_path=str(tmp_path / "outbox.db"))
+    yield window
+    window.prefetcher.stop(timeout=1)
+    window.email_outbox.stop(timeout=1)
+    window.destroy()
+    stub.stop()
+
+
+def test_search_fills_the_schedule_table(window):
+    date_entry = _find(window, tk.Entry)
+    date_entry.insert(0, "2024-01-01")
+    search_button = window.service_widgets[0]
+    search_button.invoke()
+
+    table = None
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        window.update()
+        table = _find(window, VirtualTable)
+        if table is not None and window.schedule_store.has_schedules("Location 1", "2024-01-01"):
+            break
+        time.sleep(0.01)
+
+    assert table is not None
+    assert len(table.rows) == 30
+    assert table.rows[0][1] == "Movie m0"
+    assert window.schedule_store.has_schedules("Location 1", "2024-01-01")
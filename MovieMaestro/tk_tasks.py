@@ -0,0 +1,148 @@
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 4
+# Completed work is handed to Tk once per frame at ~60 fps.
+POLL_INTERVAL_MS = 16
+# Streamed items delivered per frame, so a fast producer cannot stall redraws.
+MAX_ITEMS_PER_POLL = 4
+
+
+class TkTask:
+    def __init__(self, channel=None, on_success=None, on_item=None, on_error=None):
+        self.channel = channel
+        self.on_success = on_success
+        self.on_item = on_item
+        self.on_error = on_error
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            return self.future.cancel()
+        return False
+
+
+class TkTaskRunner:
+    def __init__(self, root, max_workers=DEFAULT_MAX_WORKERS, on_busy_changed=None):
+        self.root = root
+        self.on_busy_changed = on_busy_changed
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tk-task")
+        self._results = queue.Queue()
+        self._latest = {}
+        self._pending = 0
+        self._polling = False
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def submit(self, func, *args, on_success=None, on_error=None, channel=None):
+        task = TkTask(channel, on_success=on_success, on_error=on_error)
+        return self._start(task, self._run, func, args)
+
+    def submit_stream(self, func, *args, on_item=None, on_done=None, on_error=None, channel=None):
+        # func returns an iterator; each item is passed to on_item on the Tk
+        # thread as it is produced, and iteration stops once the task is
+        # cancelled or superseded.
+        task = TkTask(channel, on_success=on_done, on_item=on_item, on_error=on_error)
+        return self._start(task, self._run_stream, func, args)
+
+    def cancel(self, channel):
+        task = self._latest.pop(channel, None)
+        if task is not None:
+            self._cancel(task)
+
+    def cancel_task(self, task):
+        if self._latest.get(task.channel) is task:
+            del self._latest[task.channel]
+        self._cancel(task)
+
+    def shutdown(self):
+        for task in list(self._latest.values()):
+            self._cancel(task)
+        self._executor.shutdown(wait=False)
+
+    def _start(self, task, runner, func, args):
+        # Must be called from the Tk thread. A task on a channel supersedes the
+        # previous one on that channel: its callbacks will never run.
+        if task.channel is not None:
+            previous = self._latest.get(task.channel)
+            if previous is not None:
+                self._cancel(previous)
+            self._latest[task.channel] = task
+
+        self._set_pending(self._pending + 1)
+        task.future = self._executor.submit(runner, task, func, args)
+        self._ensure_polling()
+        return task
+
+    def _cancel(self, task):
+        if not task.cancelled and task.cancel():
+            # Never started, so it will never report back.
+            self._set_pending(self._pending - 1)
+
+    def _run(self, task, func, args):
+        if task.cancelled:
+            self._results.put((task, "done", None))
+            return
+        try:
+            self._results.put((task, "done", func(*args)))
+        except Exception as e:
+            self._results.put((task, "error", e))
+
+    def _run_stream(self, task, func, args):
+        try:
+            for item in func(*args):
+                if task.cancelled:
+                    break
+                self._results.put((task, "item", item))
+            self._results.put((task, "done", None))
+        except Exception as e:
+            self._results.put((task, "error", e))
+
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        items_delivered = 0
+        while items_delivered < MAX_ITEMS_PER_POLL:
+            try:
+                task, kind, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "item":
+                if not task.cancelled and task.on_item is not None:
+                    task.on_item(payload)
+                    items_delivered += 1
+                continue
+
+            self._set_pending(self._pending - 1)
+            if task.channel is not None and self._latest.get(task.channel) is task:
+                del self._latest[task.channel]
+            if task.cancelled:
+                continue
+
+            if kind == "error":
+                if task.on_error is not None:
+                    task.on_error(payload)
+                else:
+                    logging.error(f"Error occurred in background task: {payload}")
+            elif task.on_success is not None:
+                task.on_success(payload)
+
+        if self._pending > 0 or not self._results.empty():
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def _set_pending(self, pending):
+        was_busy = self._pending > 0
+        self._pending = pending
+        if self.on_busy_changed is not None and was_busy != (pending > 0):
+            self.on_busy_changed(pending > 0)
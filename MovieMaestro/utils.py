@@ -1,7 +1,9 @@
+import functools
 import json
 import logging
 import os
 from cryptography.fernet import Fernet
+from config_service import get_fernet
 
 
 def generate_default_config(config_file_path):
@@ -33,8 +35,7 @@ def load_config(config_file_path):
 
 def encrypt_config(config, encryption_key):
     try:
-        fernet = Fernet(encryption_key)
-        encrypted_config = fernet.encrypt(json.dumps(config).encode())
+        encrypted_config = get_fernet(encryption_key).encrypt(json.dumps(config).encode())
         return encrypted_config
     except Exception as e:
         logging.error(f"Error occurred while encrypting config: {e}")
@@ -43,14 +44,18 @@ def encrypt_config(config, encryption_key):
 
 def decrypt_config(encrypted_config, encryption_key):
     try:
-        fernet = Fernet(encryption_key)
-        decrypted_config = fernet.decrypt(encrypted_config).decode()
-        return json.loads(decrypted_config)
+        return dict(_decrypt_config(encrypted_config, encryption_key))
     except Exception as e:
         logging.error(f"Error occurred while decrypting config: {e}")
         return None
 
 
+@functools.lru_cache(maxsize=8)
+def _decrypt_config(encrypted_config, encryption_key):
+    decrypted_config = get_fernet(encryption_key).decrypt(encrypted_config).decode()
+    return json.loads(decrypted_config)
+
+
 def generate_encryption_key(key_file_path):
     try:
         if not os.path.exists(key_file_path):
@@ -0,0 +1,182 @@
+from tkinter import ttk
+
+DEFAULT_ROW_HEIGHT = 20
+DEFAULT_BUFFER_ROWS = 5
+
+
+def _sort_key(value):
+    # Numbers sort numerically and before text; everything else by its text.
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    try:
+        return (0, float(value), "")
+    except (TypeError, ValueError):
+        return (1, 0, str(value).lower())
+
+
+class VirtualTable(ttk.Frame):
+    # A Treeview that only materializes the rows in view (plus a small buffer)
+    # from a backing row list, so opening and scrolling cost the same for ten
+    # rows or fifty thousand. Sorting and filtering only reorder the view.
+    def __init__(self, master, columns, row_height=DEFAULT_ROW_HEIGHT, buffer_rows=DEFAULT_BUFFER_ROWS, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = tuple(columns)
+        self.row_height = row_height
+        self.buffer_rows = buffer_rows
+
+        self.rows = []
+        self.view = []
+        self.first_row = 0
+        self.sort_column = None
+        self.sort_descending = False
+        self.filters = {}
+        self._item_ids = []
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", selectmode="browse")
+        for column in self.columns:
+            self.tree.heading(column, text=column, command=lambda column=column: self.toggle_sort(column))
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", lambda event: self._render())
+        self.tree.bind("<MouseWheel>", self._on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda event: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self._scroll_by(3))
+        self.tree.bind("<Prior>", lambda event: self._scroll_by(-self.visible_rows))
+        self.tree.bind("<Next>", lambda event: self._scroll_by(self.visible_rows))
+
+    @property
+    def visible_rows(self):
+        height = self.tree.winfo_height()
+        if height <= 1:
+            height = int(self.tree.cget("height")) * self.row_height
+        # One row's worth of height goes to the headings
+        return max(height // self.row_height - 1, 1)
+
+    def set_rows(self, rows):
+        self.rows = [tuple(row) for row in rows]
+        self._rebuild_view()
+
+    def append_rows(self, rows):
+        # Returns the position of the first appended row in self.rows.
+        start = len(self.rows)
+        self.rows.extend(tuple(row) for row in rows)
+        new_positions = [index for index in range(start, len(self.rows)) if self._matches(self.rows[index])]
+        self.view.extend(new_positions)
+        if self.sort_column is not None and new_positions:
+            self._sort_view()
+        self._render()
+        return start
+
+    def update_cells(self, updates):
+        # updates are (position in self.rows, column, value) triples; the view
+        # is only re-sorted or re-filtered when an affected column needs it.
+        changed_columns = set()
+        for position, column, value in updates:
+            column_index = self.columns.index(column)
+            row = self.rows[position]
+            self.rows[position] = row[:column_index] + (value,) + row[column_index + 1:]
+            changed_columns.add(column)
+        if not changed_columns:
+            return
+        if changed_columns & set(self.filters):
+            first_row = self.first_row
+            self._rebuild_view()
+            self._scroll_to(first_row)
+        elif self.sort_column in changed_columns:
+            self._sort_view()
+            self._render()
+        else:
+            self._render()
+
+    def clear(self):
+        self.rows = []
+        self._rebuild_view()
+
+    def sort_by(self, column, descending=False):
+        self.sort_column = column
+        self.sort_descending = descending
+        self._sort_view()
+        self.first_row = 0
+        self._render()
+
+    def toggle_sort(self, column):
+        descending = self.sort_column == column and not self.sort_descending
+        self.sort_by(column, descending)
+
+    def set_filter(self, column, text):
+        text = text.strip().lower()
+        if text:
+            self.filters[column] = text
+        else:
+            self.filters.pop(column, None)
+        self._rebuild_view()
+
+    def selected_row(self):
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self._item_ids:
+            return None
+        position = self.first_row + self._item_ids.index(selection[0])
+        return self.rows[self.view[position]]
+
+    def _matches(self, row):
+        for column, text in self.filters.items():
+            if text not in str(row[self.columns.index(column)]).lower():
+                return False
+        return True
+
+    def _rebuild_view(self):
+        if self.filters:
+            self.view = [index for index, row in enumerate(self.rows) if self._matches(row)]
+        else:
+            self.view = list(range(len(self.rows)))
+        if self.sort_column is not None:
+            self._sort_view()
+        self.first_row = 0
+        self._render()
+
+    def _sort_view(self):
+        column_index = self.columns.index(self.sort_column)
+        rows = self.rows
+        self.view.sort(key=lambda index: _sort_key(rows[index][column_index]), reverse=self.sort_descending)
+
+    def _render(self):
+        total = len(self.view)
+        visible = self.visible_rows
+        self.first_row = max(min(self.first_row, total - visible), 0)
+        end = min(self.first_row + visible + self.buffer_rows, total)
+
+        # Treeview items are recycled; only their values change while scrolling
+        needed = end - self.first_row
+        while len(self._item_ids) < needed:
+            self._item_ids.append(self.tree.insert("", "end"))
+        while len(self._item_ids) > needed:
+            self.tree.delete(self._item_ids.pop())
+        for item_id, position in zip(self._item_ids, range(self.first_row, end)):
+            self.tree.item(item_id, values=self.rows[self.view[position]])
+
+        if total:
+            self.scrollbar.set(self.first_row / total, min(self.first_row + visible, total) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _scroll_to(self, first_row):
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self._render()
+
+    def _scroll_by(self, rows):
+        self._scroll_to(max(self.first_row + rows, 0))
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(max(int(float(amount) * len(self.view)), 0))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self._scroll_by(int(amount) * step)
+
+    def _on_mouse_wheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)